@@ -1,30 +1,31 @@
-"""
-Image Downloader Application Package
-
-This __init__.py file makes the 'app' directory a Python package.
-"""
-
-# Package version
-__version__ = "1.0.0"
-
-# Import only non-circular components
-from .models import (
-    DownloadItem,
-    DownloadBatch,
-    AppConfig
-)
-
-# Defer controller import to avoid circularity
-def get_controller():
-    from .controller import ImageDownloaderApp
-    return ImageDownloaderApp
-
-__all__ = [
-    'get_controller',
-    'DownloadItem',
-    'DownloadBatch',
-    'AppConfig'
-]
-
-# Package initialization
-print(f"Initializing {__name__} {__version__}")
\ No newline at end of file
+"""
+Image Downloader Application Package
+
+This __init__.py file makes the 'app' directory a Python package.
+"""
+
+# Package version
+__version__ = "1.0.0"
+
+# Import only non-circular components
+from .models import (
+    DownloadItem,
+    DownloadBatch,
+    AppConfig
+)
+
+# Defer controller import to avoid circularity
+def get_controller():
+    from .controller import ImageDownloaderApp
+    return ImageDownloaderApp
+
+__all__ = [
+    'get_controller',
+    'DownloadItem',
+    'DownloadBatch',
+    'AppConfig'
+]
+
+# Package initialization, on stderr so the CLI's JSON output stays clean
+import sys
+print(f"Initializing {__name__} {__version__}", file=sys.stderr)
\ No newline at end of file
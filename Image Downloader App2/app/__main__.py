@@ -0,0 +1,180 @@
+"""
+Headless entry point: python -m app INPUT -o OUTPUT [options]
+
+Runs a batch without Qt and writes one JSON object per line to stdout:
+{"event": "log", ...} for each log line, {"event": "progress", ...} for
+each progress snapshot and a final {"event": "finished", ...}.
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+from typing import List, Optional
+from .constants import (
+    ADAPTIVE_MAX_CONCURRENCY,
+    ADAPTIVE_MIN_CONCURRENCY,
+    LEASE_SECONDS,
+    MAX_RETRIES,
+    PRIORITY_NAMES
+)
+from .downloader import DownloadCore
+from .models import ImageConversionSettings, ProgressSnapshot
+from .utils import read_download_items, write_error_report
+
+def _emit(event: str, **fields):
+    print(json.dumps({"event": event, **fields}), flush=True)
+
+def _emit_snapshot(snapshot: ProgressSnapshot):
+    if snapshot.dropped_messages:
+        _emit("log", level="info", message=f"({snapshot.dropped_messages} more messages not shown)")
+    for message, level in snapshot.messages:
+        _emit("log", level=level, message=message)
+    _emit(
+        "progress",
+        total=snapshot.total,
+        completed=snapshot.completed,
+        failed=snapshot.failed,
+        bytes=snapshot.bytes_downloaded,
+        current_file=snapshot.current_file,
+        elapsed=round(snapshot.elapsed, 3),
+        concurrency=snapshot.concurrency_limits
+    )
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m app",
+        description="Download the images listed in a CSV or XLSX file."
+    )
+    parser.add_argument("input", nargs="?",
+                        help="CSV or XLSX file with one image URL per row (optional with --queue)")
+    parser.add_argument("-o", "--output", required=True, help="Directory to save images to")
+    parser.add_argument("--url-column", default="url", help="Header of the URL column (default: url)")
+    parser.add_argument("--filename-column", default="filename",
+                        help="Header of the optional filename column (default: filename)")
+    parser.add_argument("--priority-column", default="priority",
+                        help="Header of the optional priority column, low/normal/high (default: priority)")
+
+    tuning = parser.add_argument_group("tuning")
+    tuning.add_argument("--engine", choices=["threads", "asyncio"], default="threads")
+    tuning.add_argument("--workers", type=int, default=5, help="Download threads (threads engine)")
+    tuning.add_argument("--concurrency", type=int, default=200, help="In-flight downloads (asyncio engine)")
+    tuning.add_argument("--shards", type=int, default=1,
+                        help="Split the batch across this many processes, each with its own workers")
+    tuning.add_argument("--retries", type=int, default=MAX_RETRIES)
+    tuning.add_argument("--priority", choices=list(PRIORITY_NAMES), default="normal",
+                        help="Priority of rows without one in the priority column")
+    tuning.add_argument("--max-size", type=int, default=100, help="Largest file to keep, in MB")
+    tuning.add_argument("--adaptive", action="store_true",
+                        help="Tune each host's concurrency from its latency and errors, starting at --workers")
+    tuning.add_argument("--min-concurrency", type=int, default=ADAPTIVE_MIN_CONCURRENCY,
+                        help="Lowest per-host concurrency in adaptive mode")
+    tuning.add_argument("--max-concurrency", type=int, default=ADAPTIVE_MAX_CONCURRENCY,
+                        help="Highest per-host concurrency in adaptive mode")
+
+    output = parser.add_argument_group("output")
+    output.add_argument("--format", default="original", help="original, jpeg, png, webp or gif")
+    output.add_argument("--max-width", type=int, default=0, help="Downscale wider images (0: keep)")
+    output.add_argument("--max-height", type=int, default=0, help="Downscale taller images (0: keep)")
+    output.add_argument("--quality", type=int, default=85, help="JPEG/WEBP quality when converting")
+    output.add_argument("--dedup", action="store_true", help="Store identical images once, hardlinked")
+    output.add_argument("--blob-dir", help="Dedup store location (default: OUTPUT/.blobs)")
+
+    state = parser.add_argument_group("state")
+    state.add_argument("--resume", action="store_true", help="Skip items a previous run finished")
+    state.add_argument("--no-journal", action="store_true", help="Don't checkpoint item states")
+    state.add_argument("--cache", metavar="PATH", help="Validator cache file for conditional re-downloads")
+    state.add_argument("--negative-cache", metavar="PATH",
+                       help="Dead URL cache file: 404s, 410s and unresolvable hosts fail at once on later runs")
+    state.add_argument("--retry-dead", action="store_true",
+                       help="Request URLs the dead URL cache would skip, updating it with the results")
+    state.add_argument("--queue", metavar="PATH",
+                       help="Shared work queue file: INPUT rows are added to it, then this process "
+                            "downloads whatever it leases alongside the other workers using it")
+    state.add_argument("--lease", type=float, default=LEASE_SECONDS,
+                       help="Seconds before a dead worker's queue items go to the others")
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.input and not args.queue:
+        parser.error("an input file is required without --queue")
+    if args.queue and args.shards > 1:
+        parser.error("--shards can't be combined with --queue, start more workers on the queue instead")
+    try:
+        items = read_download_items(
+            args.input, args.url_column, args.filename_column, args.priority_column
+        ) if args.input else []
+    except (OSError, ValueError) as e:
+        _emit("finished", success=False, error=str(e))
+        return 2
+
+    conversion = None
+    if args.format != "original" or args.max_width or args.max_height:
+        conversion = ImageConversionSettings(
+            output_format=args.format,
+            max_width=args.max_width,
+            max_height=args.max_height,
+            quality=args.quality
+        )
+
+    options = dict(
+        items=items,
+        output_dir=args.output,
+        batch_size=args.workers,
+        max_retries=args.retries,
+        max_file_size=args.max_size,
+        use_journal=not args.no_journal,
+        resume=args.resume,
+        dedup=args.dedup,
+        blob_dir=args.blob_dir,
+        cache_path=args.cache,
+        negative_cache_path=args.negative_cache,
+        bypass_negative_cache=args.retry_dead,
+        conversion=conversion,
+        adaptive_concurrency=args.adaptive,
+        min_concurrency=args.min_concurrency,
+        max_concurrency=args.max_concurrency,
+        priority=PRIORITY_NAMES[args.priority],
+        queue_path=args.queue,
+        lease_seconds=args.lease,
+        on_snapshot=_emit_snapshot
+    )
+    if args.shards > 1:
+        from .sharded import ShardedDownloadCore
+        core = ShardedDownloadCore(
+            shards=args.shards, engine=args.engine, concurrency=args.concurrency, **options
+        )
+    elif args.engine == "asyncio":
+        # aiohttp is only needed for this mode, import on demand
+        from .async_downloader import AsyncDownloadCore
+        core = AsyncDownloadCore(concurrency=args.concurrency, **options)
+    else:
+        core = DownloadCore(**options)
+
+    # First Ctrl+C cancels cleanly, a second one kills the process
+    def interrupt(signum, frame):
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        core.cancel()
+    signal.signal(signal.SIGINT, interrupt)
+
+    result = {}
+    core.on_finished = lambda success: result.update(success=success)
+    core.start()
+
+    report = None
+    if core.failed_items:
+        report = os.path.join(args.output, "download_errors.csv")
+        write_error_report(report, core.failed_items)
+    _emit(
+        "finished",
+        success=result.get("success", False),
+        completed=core.completed,
+        failed=len(core.failed_items),
+        error_report=report
+    )
+    return 0 if result.get("success") else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+import asyncio
+import os
+import time
+import aiohttp
+from typing import Dict, Optional
+from .blobstore import new_hasher
+from .downloader import DownloadCore
+from .metrics import RequestTimings
+from .models import DownloadItem
+from .resume import ResumeState, part_path
+from .scheduler import HostScheduler
+from .session import PoolStats
+from .streaming import preallocate
+from .constants import CANCEL_GRACE, DNS_CACHE_TTL, SUBMIT_WINDOW_FACTOR
+from .utils import validate_url, convert_share_link, get_host, is_valid_image, normalize_url, SNIFF_LENGTH
+
+class AsyncDownloadCore(DownloadCore):
+    """
+    DownloadCore variant that keeps every transfer on one asyncio loop.
+
+    Uses the same snapshot/finished callbacks, retry, size-limit and
+    image-validation rules as the threaded engine, but one task per
+    in-flight download replaces the worker threads so hundreds of
+    latency-bound downloads can run at once.
+    """
+
+    def __init__(self, *args, concurrency: int = 200, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.concurrency = max(1, concurrency)
+        self._pool_stats = PoolStats()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._running: Dict[asyncio.Task, DownloadItem] = {}
+
+    def cancel(self):
+        """Cancel the download process, also cancelling the in-flight tasks on the engine's loop"""
+        super().cancel()
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._cancel_tasks)
+            except RuntimeError:
+                # The loop already finished
+                pass
+
+    def _cancel_tasks(self):
+        for task in self._running:
+            task.cancel()
+
+    def _connection_stats(self) -> PoolStats:
+        return self._pool_stats
+
+    def _download_all(self):
+        """Run the whole batch on a private event loop"""
+        try:
+            asyncio.run(self._download_all_async())
+        finally:
+            self._loop = None
+
+    async def _download_all_async(self):
+        total = len(self.items)
+        self.completed = 0
+        self.failed_items = []
+        self._pool_stats = PoolStats()
+        self._loop = asyncio.get_running_loop()
+
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency, limit_per_host=0, use_dns_cache=True, ttl_dns_cache=DNS_CACHE_TTL
+        )
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=30)
+        async with aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            trace_configs=[self._trace_config()]
+        ) as session:
+            scheduler = HostScheduler(
+                self._create_limiter(),
+                sources=self._pending_sources(total),
+                window=self.concurrency * SUBMIT_WINDOW_FACTOR,
+                breakers=self.breakers,
+                default_priority=self.priority
+            )
+
+            running = self._running = {}
+            converting = {}
+            wakeup_source, wakeup = None, None
+            while self._batch_open(scheduler.has_work or running or converting):
+                self._take_added(scheduler, total)
+                if wakeup_source is not self._wakeup:
+                    # Resolves when cancel() or add_items() is called, ends any wait below
+                    wakeup_source = self._wakeup
+                    wakeup = asyncio.wrap_future(wakeup_source)
+                wait_time = None
+                while len(running) < self.concurrency:
+                    item, wait_time = scheduler.acquire()
+                    if item is None:
+                        break
+                    self._dispatch(item)
+                    task = asyncio.create_task(self._attempt_async(session, item))
+                    running[task] = item
+
+                if not running and not converting:
+                    await asyncio.wait({wakeup}, timeout=wait_time or 0.05)
+                    continue
+
+                done, _ = await asyncio.wait(
+                    set(running) | set(converting) | {wakeup},
+                    timeout=wait_time,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if self._cancel:
+                        break
+                    if task is wakeup:
+                        continue
+                    if task in converting:
+                        self._finish_conversion(converting.pop(task), task, total)
+                        continue
+                    item = running.pop(task)
+                    scheduler.release(item)
+                    self._finish_item(item, task, total, scheduler)
+                    conversion = self._conversions.pop(id(item), None)
+                    if conversion is not None:
+                        converting[asyncio.wrap_future(conversion)] = item
+
+            if running:
+                # Cancelled: the tasks were cancelled too, count the ones that finished anyway
+                self._drain((await asyncio.wait(running, timeout=CANCEL_GRACE))[0], running, total)
+
+    async def _attempt_async(self, session: aiohttp.ClientSession, item: DownloadItem) -> bool:
+        """Task entry point, see DownloadCore._attempt"""
+        result = False
+        try:
+            result = await self._download_item_async(session, item)
+            return result
+        except Exception:
+            if self._cancel:
+                return False
+            raise
+        finally:
+            if self._cancel and not result:
+                state = self._attempts.get(id(item))
+                self._discard_part(state.filepath if state else None)
+
+    async def _download_item_async(self, session: aiohttp.ClientSession, item: DownloadItem) -> bool:
+        """Make one download attempt for an item, see DownloadCore._download_item"""
+        state = self._attempt_state(item)
+        if self._cancel:
+            return False
+
+        # Convert share links to direct download links
+        direct_url = convert_share_link(item.url)
+        if not direct_url:
+            item.error = "Invalid URL or unsupported cloud service"
+            return False
+
+        if not validate_url(direct_url):
+            item.error = "Invalid URL"
+            return False
+
+        if self.breakers.get(get_host(item.url)).given_up:
+            item.error = "Host unavailable after repeated failures"
+            return False
+
+        cache_key = normalize_url(direct_url)
+
+        resume = state.resume
+        offset = resume.resume_offset(part_path(state.filepath)) if resume and state.filepath else 0
+        headers = resume.request_headers(offset) if offset else {}
+
+        cached = None
+        if not state.revalidated and self.cache:
+            cached = self.cache.lookup(cache_key)
+            if cached:
+                headers.update(cached.conditional_headers())
+
+        host = get_host(item.url)
+        timings = RequestTimings()
+        requested = time.perf_counter()
+        async with session.get(direct_url, headers=headers, trace_request_ctx=timings) as response:
+            headers_at = time.perf_counter()
+            timings.ttfb = state.ttfb = headers_at - requested - timings.setup
+            self.metrics.record_request(host, timings, response.status)
+            if cached and response.status == 304:
+                return self._use_cached(item, cached)
+            if self.cache and not state.revalidated:
+                self.cache.record_miss()
+            state.revalidated = True
+            response.raise_for_status()
+
+            # Chunks as aiohttp buffered them, no re-slicing to a fixed size
+            chunks = response.content.iter_any()
+            if offset and resume.accepts(response.status, response.headers, offset):
+                mode = 'ab'
+                first_chunk = b''
+                self._log(f"Resuming {item.filename} at {offset/1024/1024:.1f}MB", "info")
+            else:
+                self._reject_partial(response.status, state)
+                mode = 'wb'
+                resume = state.resume = ResumeState.from_headers(response.headers)
+
+                content_length = int(response.headers.get('content-length', 0))
+                if content_length > self.max_file_size:
+                    item.error = f"File too large ({content_length/1024/1024:.1f}MB > {self.max_file_size/1024/1024:.1f}MB)"
+                    return False
+
+                first_chunk = b''
+                async for chunk in chunks:
+                    first_chunk += chunk
+                    if len(first_chunk) >= SNIFF_LENGTH:
+                        break
+
+                # Check if it's actually an image
+                content_type = response.headers.get('content-type', '')
+                if not is_valid_image(content_type, first_chunk):
+                    item.error = "URL does not point to a valid image"
+                    return False
+
+                if not item.filename:
+                    item.filename = self._generate_filename(direct_url, content_type, first_chunk)
+
+            if state.filepath is None:
+                state.filepath = self.names.reserve(item.filename)
+            filepath = state.filepath
+            partpath = part_path(filepath)
+
+            hasher = new_hasher(partpath if mode == 'ab' else None) if self.blob_store else None
+            received = offset + len(first_chunk)
+            with open(partpath, mode) as f:
+                preallocated = mode == 'wb' and preallocate(f, resume.length)
+                try:
+                    f.write(first_chunk)
+                    self.events.add_bytes(len(first_chunk))
+                    if hasher:
+                        hasher.update(first_chunk)
+                    async for chunk in chunks:
+                        if self._cancel:
+                            return False
+                        if chunk:
+                            # content-length may be missing or wrong, count what actually arrives
+                            received += len(chunk)
+                            if received > self.max_file_size:
+                                break
+                            f.write(chunk)
+                            self.events.add_bytes(len(chunk))
+                            if hasher:
+                                hasher.update(chunk)
+                finally:
+                    if preallocated:
+                        f.truncate()
+
+        self.metrics.record_transfer(host, time.perf_counter() - headers_at, received - offset)
+        if received > self.max_file_size:
+            item.error = f"File too large (over {self.max_file_size/1024/1024:.1f}MB)"
+            self._discard_part(filepath)
+            return False
+
+        if resume.length is not None and os.path.getsize(partpath) != resume.length:
+            raise IOError(f"Incomplete download ({os.path.getsize(partpath)} of {resume.length} bytes)")
+
+        self._store_download(item, partpath, filepath, hasher)
+        if self.converter:
+            # Submitting blocks while the conversion queue is full, keep it off the loop
+            await asyncio.to_thread(self._queue_conversion, item, filepath)
+        elif self.cache:
+            self.cache.store(cache_key, resume.etag, resume.last_modified, filepath)
+
+        self._log(f"Downloaded {item.filename}", "info")
+        return True
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        """
+        Count requests, newly opened connections and DNS cache hits for the
+        summary, and fill in the DNS and connect time of the request's RequestTimings.
+        aiohttp doesn't report the TLS handshake on its own, so it is
+        counted as part of connect.
+        """
+        trace = aiohttp.TraceConfig()
+
+        def timings(context):
+            ctx = context.trace_request_ctx
+            return ctx if isinstance(ctx, RequestTimings) else None
+
+        async def on_request_start(session, context, params):
+            self._pool_stats.requests += 1
+
+        async def on_connection_create_start(session, context, params):
+            context.connect_started = time.perf_counter()
+
+        async def on_connection_create_end(session, context, params):
+            self._pool_stats.connections += 1
+            request = timings(context)
+            if request is not None:
+                elapsed = time.perf_counter() - context.connect_started
+                request.connect = max(0.0, elapsed - (request.dns or 0))
+
+        async def on_dns_cache_hit(session, context, params):
+            self._pool_stats.dns_hits += 1
+
+        async def on_dns_cache_miss(session, context, params):
+            self._pool_stats.dns_misses += 1
+
+        async def on_dns_resolvehost_start(session, context, params):
+            context.dns_started = time.perf_counter()
+
+        async def on_dns_resolvehost_end(session, context, params):
+            request = timings(context)
+            if request is not None:
+                request.dns = time.perf_counter() - context.dns_started
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_start.append(on_connection_create_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+        trace.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+        trace.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace
@@ -0,0 +1,76 @@
+import errno
+import filecmp
+import hashlib
+import os
+import shutil
+import threading
+
+BLOB_DIRNAME = ".blobs"
+
+def new_hasher(resume_from: str = None):
+    """SHA-256 hasher, primed with an existing partial file when resuming"""
+    hasher = hashlib.sha256()
+    if resume_from and os.path.exists(resume_from):
+        with open(resume_from, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                hasher.update(block)
+    return hasher
+
+def link_or_copy(src: str, dest: str):
+    """Hardlink src to dest, copying when the filesystem can't link them"""
+    try:
+        os.link(src, dest)
+    except OSError as e:
+        # EXDEV: other filesystem, EPERM/ENOTSUP/EMLINK: no (more) hardlinks
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.ENOTSUP, errno.EMLINK):
+            raise
+        shutil.copy2(src, dest)
+
+def same_content(a: str, b: str) -> bool:
+    """Whether two paths are the same file, a hardlink of it, or a byte-identical copy"""
+    try:
+        return os.path.samefile(a, b) or filecmp.cmp(a, b, shallow=False)
+    except OSError:
+        return False
+
+class BlobStore:
+    """
+    Content-addressed store keeping one copy of each unique download.
+
+    Blobs live under root as <hash[:2]>/<hash>. Output files are hardlinks
+    to their blob, so the same image listed under many SKUs or served from
+    different URLs takes disk space once. When the store and the output
+    directory are on different filesystems the blob is copied instead.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.unique = 0
+        self.duplicates = 0
+        self._lock = threading.Lock()
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def add(self, path: str, digest: str) -> str:
+        """Move a finished download into the store, or drop it if already stored"""
+        blob = self.blob_path(digest)
+        with self._lock:
+            if os.path.exists(blob):
+                os.remove(path)
+                self.duplicates += 1
+                return blob
+
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            try:
+                os.replace(path, blob)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                shutil.move(path, blob)
+            self.unique += 1
+        return blob
+
+    def materialize(self, digest: str, dest: str):
+        """Expose a stored blob at dest as a hardlink, copying across filesystems"""
+        link_or_copy(self.blob_path(digest), dest)
@@ -1,96 +1,135 @@
-from enum import Enum, auto
-from pathlib import Path
-import platform
-import os
-
-class FileType(Enum):
-    """Supported file types for input data"""
-    CSV = auto()
-    EXCEL = auto()
-    JSON = auto()
-
-class ImageFormat(Enum):
-    """Supported output image formats"""
-    ORIGINAL = auto()
-    JPEG = auto()
-    PNG = auto()
-    WEBP = auto()
-
-# Application constants
-APP_NAME = "Image Downloader"
-APP_VERSION = "1.0.0"
-ORGANIZATION_NAME = "ImageTools"
-DEFAULT_CONFIG_FILENAME = "config.json"
-SUPPORTED_INPUT_FORMATS = [".csv", ".xlsx", ".xls"]
-SUPPORTED_IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".webp", ".gif"]
-
-# Network constants
-MAX_RETRIES = 3
-RETRY_DELAYS = [1, 2, 4]  # Seconds between retries (exponential backoff)
-TIMEOUT = 30  # Seconds
-MAX_FILE_SIZE = 100 * 1024 * 1024  # 100 MB in bytes
-CHUNK_SIZE = 8192  # For streaming downloads
-
-# UI constants
-DEFAULT_THEME = "dark_teal"
-THEMES = [
-    "dark_teal",
-    "dark_amber",
-    "dark_cyan",
-    "light_teal",
-    "light_amber",
-    "light_cyan"
-]
-MAX_THUMBNAIL_SIZE = 100  # pixels
-MAX_PREVIEW_ROWS = 5
-LOG_LINE_LIMIT = 1000  # Max lines in log window
-
-# Platform-specific paths
-if platform.system() == "Windows":
-    CONFIG_DIR = Path(os.getenv('APPDATA')) / ORGANIZATION_NAME
-else:
-    CONFIG_DIR = Path.home() / ".config" / ORGANIZATION_NAME
-
-DOWNLOADS_DIR = Path.home() / "Downloads"
-
-# Cloud service constants
-DROPBOX_DL_PARAM = "dl=1"
-GOOGLE_DRIVE_BASE = "https://drive.google.com/uc?export=download"
-AWS_S3_EXPIRY = 3600  # 1 hour for temporary URLs
-
-# Error messages
-ERROR_INVALID_URL = "Invalid URL format"
-ERROR_FILE_TOO_LARGE = "File exceeds maximum size limit"
-ERROR_UNSUPPORTED_TYPE = "Unsupported file type"
-ERROR_NETWORK = "Network error occurred"
-ERROR_AUTH_REQUIRED = "Authentication required"
-
-# Status messages
-STATUS_READY = "Ready"
-STATUS_LOADING = "Loading file..."
-STATUS_DOWNLOADING = "Downloading images..."
-STATUS_COMPLETED = "Download completed"
-STATUS_CANCELLED = "Download cancelled"
-
-class LogLevel(Enum):
-    """Logging level constants"""
-    INFO = "INFO"
-    WARNING = "WARNING"
-    ERROR = "ERROR"
-    DEBUG = "DEBUG"
-
-# MIME type mappings
-MIME_TO_EXTENSION = {
-    "image/jpeg": ".jpg",
-    "image/png": ".png",
-    "image/webp": ".webp",
-    "image/gif": ".gif"
-}
-
-# Magic numbers for image validation
-IMAGE_MAGIC_NUMBERS = {
-    b'\xFF\xD8\xFF': "JPEG",
-    b'\x89PNG': "PNG",
-    b'RIFF....WEBP': "WEBP",
-    b'GIF8': "GIF"
+from enum import Enum, auto
+from pathlib import Path
+import platform
+import os
+
+class FileType(Enum):
+    """Supported file types for input data"""
+    CSV = auto()
+    EXCEL = auto()
+    JSON = auto()
+
+class ImageFormat(Enum):
+    """Supported output image formats"""
+    ORIGINAL = auto()
+    JPEG = auto()
+    PNG = auto()
+    WEBP = auto()
+
+# Application constants
+APP_NAME = "Image Downloader"
+APP_VERSION = "1.0.0"
+ORGANIZATION_NAME = "ImageTools"
+DEFAULT_CONFIG_FILENAME = "config.json"
+SUPPORTED_INPUT_FORMATS = [".csv", ".xlsx", ".xls"]
+SUPPORTED_IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".webp", ".gif"]
+
+# Network constants
+MAX_RETRIES = 3
+RETRY_DELAYS = [1, 2, 4]  # Max seconds before each retry, jittered (exponential backoff)
+MAX_RETRY_AFTER = 300  # Cap on a server's Retry-After, in seconds
+BREAKER_THRESHOLD = 5  # Consecutive failures before a host is paused
+BREAKER_COOLDOWN = 30  # Seconds a failing host is paused before a probe
+TIMEOUT = 30  # Seconds
+CANCEL_GRACE = 0.5  # Seconds a cancel waits for in-flight downloads before abandoning them
+LEASE_SECONDS = 60  # A work queue item goes back to the queue this long after its worker's last heartbeat
+LEASE_BATCH = 32  # Items leased per query
+LEASE_POLL_INTERVAL = 2.0  # Seconds between queries while other workers hold everything left
+QUEUE_LOCK_TIMEOUT = 30  # Seconds to wait for another worker's write to the queue
+MAX_FILE_SIZE = 100 * 1024 * 1024  # 100 MB in bytes
+STREAM_BUFFER_MIN = 64 * 1024  # Bounds of a streaming read, adapted to the link speed
+STREAM_BUFFER_MAX = 1024 * 1024
+STREAM_READ_TARGET = 0.1  # Seconds one read should take
+PREALLOCATE_MIN_SIZE = 4 * 1024 * 1024  # Reserve disk space up front for files at least this big
+HOST_AFFINITY = 8  # Items a host may send back-to-back over its warm connections before others get a turn
+DNS_CACHE_TTL = 60  # Seconds a resolved address is reused
+DNS_NEGATIVE_TTL = 5  # Seconds a failed lookup is remembered
+DNS_CACHE_MAX_ENTRIES = 10000
+# Seconds a URL that failed for good is skipped on later runs, by HTTP status
+NEGATIVE_CACHE_TTLS = {404: 7 * 24 * 3600, 410: 30 * 24 * 3600}
+NEGATIVE_DNS_TTL = 3600  # Same for a host name that didn't resolve, which gets fixed sooner
+NEGATIVE_CACHE_MAX_ENTRIES = 100000
+SUBMIT_WINDOW_FACTOR = 4  # Items buffered ahead of the workers, per worker
+PRIORITY_LOW = 0  # Priority lanes, higher goes first
+PRIORITY_NORMAL = 1
+PRIORITY_HIGH = 2
+PRIORITY_NAMES = {"low": PRIORITY_LOW, "normal": PRIORITY_NORMAL, "high": PRIORITY_HIGH}
+# Share of dispatches each lane gets while all of them have work, so low is slowed but never starved
+PRIORITY_WEIGHTS = {PRIORITY_LOW: 1, PRIORITY_NORMAL: 4, PRIORITY_HIGH: 16}
+ADAPTIVE_MIN_CONCURRENCY = 1  # Bounds of a host's adaptive concurrency limit
+ADAPTIVE_MAX_CONCURRENCY = 32
+AIMD_BACKOFF = 0.5  # Limit multiplier on timeouts, 429s and 5xx
+AIMD_LATENCY_TOLERANCE = 2.0  # Time to first byte over this multiple of the baseline means overload
+AIMD_LATENCY_SLACK = 0.02  # Seconds of latency rise always treated as noise
+
+# Per-domain request limits, applied to the domain and its subdomains
+DEFAULT_HOST_LIMITS = {
+    "dropbox.com": {"max_concurrency": 3, "rate": 4.0, "burst": 8},
+    "drive.google.com": {"max_concurrency": 2, "rate": 2.0, "burst": 4}
+}
+
+# UI constants
+DEFAULT_THEME = "dark_teal"
+THEMES = [
+    "dark_teal",
+    "dark_amber",
+    "dark_cyan",
+    "light_teal",
+    "light_amber",
+    "light_cyan"
+]
+MAX_THUMBNAIL_SIZE = 100  # pixels
+MAX_PREVIEW_ROWS = 5
+LOG_LINE_LIMIT = 1000  # Max lines in log window
+SNAPSHOT_INTERVAL = 0.1  # Seconds between progress snapshots sent to the UI
+SNAPSHOT_MAX_MESSAGES = 50  # Log lines carried per snapshot, older ones are dropped
+
+# Platform-specific paths
+if platform.system() == "Windows":
+    CONFIG_DIR = Path(os.getenv('APPDATA')) / ORGANIZATION_NAME
+else:
+    CONFIG_DIR = Path.home() / ".config" / ORGANIZATION_NAME
+
+DOWNLOADS_DIR = Path.home() / "Downloads"
+
+# Cloud service constants
+DROPBOX_DL_PARAM = "dl=1"
+GOOGLE_DRIVE_BASE = "https://drive.google.com/uc?export=download"
+AWS_S3_EXPIRY = 3600  # 1 hour for temporary URLs
+
+# Error messages
+ERROR_INVALID_URL = "Invalid URL format"
+ERROR_FILE_TOO_LARGE = "File exceeds maximum size limit"
+ERROR_UNSUPPORTED_TYPE = "Unsupported file type"
+ERROR_NETWORK = "Network error occurred"
+ERROR_AUTH_REQUIRED = "Authentication required"
+
+# Status messages
+STATUS_READY = "Ready"
+STATUS_LOADING = "Loading file..."
+STATUS_DOWNLOADING = "Downloading images..."
+STATUS_COMPLETED = "Download completed"
+STATUS_CANCELLED = "Download cancelled"
+
+class LogLevel(Enum):
+    """Logging level constants"""
+    INFO = "INFO"
+    WARNING = "WARNING"
+    ERROR = "ERROR"
+    DEBUG = "DEBUG"
+
+# MIME type mappings
+MIME_TO_EXTENSION = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif"
+}
+
+# Magic numbers for image validation
+IMAGE_MAGIC_NUMBERS = {
+    b'\xFF\xD8\xFF': "JPEG",
+    b'\x89PNG': "PNG",
+    b'RIFF....WEBP': "WEBP",
+    b'GIF8': "GIF"
 }
\ No newline at end of file
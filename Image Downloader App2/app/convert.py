@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional
+from PIL import Image
+from .constants import MIME_TO_EXTENSION
+from .models import ImageConversionSettings
+from .resume import part_path
+
+# spawn everywhere, so conversion workers never fork a process that runs
+# Qt, the journal writer and download threads
+_context = multiprocessing.get_context("spawn")
+
+def _pillow_format(output_format: str) -> str:
+    fmt = output_format.upper()
+    return "JPEG" if fmt == "JPG" else fmt
+
+def output_extension(settings: ImageConversionSettings, filename: str) -> str:
+    """Extension the converted file will have, with its leading dot"""
+    fmt = settings.output_format.lower()
+    if fmt == "original":
+        return os.path.splitext(filename)[1]
+    return MIME_TO_EXTENSION.get(f"image/{_pillow_format(fmt).lower()}", f".{fmt}")
+
+def convert_image(source: str, dest: str, settings: ImageConversionSettings) -> str:
+    """
+    Convert and downscale source into dest, removing source if they differ.
+
+    Runs in a worker process. The result is written next to dest and then
+    renamed over it, so a hardlinked blob is never modified in place.
+    A zero max_width/max_height leaves that dimension unbounded.
+    """
+    with Image.open(source) as image:
+        save_format = image.format if settings.output_format.lower() == "original" \
+            else _pillow_format(settings.output_format)
+
+        bounds = (settings.max_width or image.width, settings.max_height or image.height)
+        resize = image.width > bounds[0] or image.height > bounds[1]
+        if not resize and save_format == image.format and source == dest:
+            return dest
+
+        if resize:
+            image.thumbnail(bounds)  # Keeps the aspect ratio
+        if save_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        options = {}
+        if save_format in ("JPEG", "WEBP"):
+            options['quality'] = settings.quality
+        if settings.preserve_metadata and 'exif' in image.info:
+            options['exif'] = image.info['exif']
+
+        temp = part_path(dest)
+        image.save(temp, save_format, **options)
+
+    os.replace(temp, dest)
+    if source != dest:
+        os.remove(source)
+    return dest
+
+class ConversionPool:
+    """
+    Process pool for the CPU-bound conversion stage.
+
+    Download threads submit finished files and move on to their next
+    download, so converting overlaps with downloading and Pillow never
+    holds the GIL against the I/O workers. At most `queue_size` files are
+    queued or converting; past that, submit blocks the calling download
+    thread until a conversion finishes.
+    """
+
+    def __init__(
+        self,
+        settings: ImageConversionSettings,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None
+    ):
+        self.settings = settings
+        self.workers = workers or os.cpu_count() or 1
+        self._slots = threading.BoundedSemaphore(queue_size or self.workers * 2)
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_context)
+
+    def submit(self, source: str, dest: str) -> Future:
+        self._slots.acquire()
+        future = self._pool.submit(convert_image, source, dest, self.settings)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def close(self, cancel: bool = False):
+        """Stop the worker processes, dropping queued conversions if cancel is set"""
+        self._pool.shutdown(wait=True, cancel_futures=cancel)
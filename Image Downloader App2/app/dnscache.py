@@ -0,0 +1,86 @@
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from .constants import DNS_CACHE_MAX_ENTRIES, DNS_CACHE_TTL, DNS_NEGATIVE_TTL
+
+Address = Tuple  # One getaddrinfo() result: (family, type, proto, canonname, sockaddr)
+
+class DNSCache:
+    """
+    getaddrinfo() results shared by every connection of an engine.
+
+    The system resolver doesn't report record TTLs, so answers are kept for
+    a fixed `ttl` (like aiohttp's ttl_dns_cache) and failures for
+    `negative_ttl`, so a batch full of one dead host doesn't query the
+    resolver for each item. Concurrent lookups of the same name wait for
+    the first one instead of all going to the resolver.
+    """
+
+    def __init__(
+        self,
+        ttl: float = DNS_CACHE_TTL,
+        negative_ttl: float = DNS_NEGATIVE_TTL,
+        max_entries: int = DNS_CACHE_MAX_ENTRIES
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # (host, port) -> (expires, addresses or the lookup error)
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[float, object]]" = OrderedDict()
+        self._pending: Dict[Tuple[str, int], threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, host: str, port: int) -> List[Address]:
+        """TCP addresses for host:port, raising socket.gaierror like getaddrinfo"""
+        key = (host, port)
+        while True:
+            with self._lock:
+                result = self._cached(key)
+                if result is not None:
+                    self.hits += 1
+                    break
+                pending = self._pending.get(key)
+                if pending is None:
+                    self.misses += 1
+                    self._pending[key] = threading.Event()
+            if pending is None:
+                result = self._lookup(key)
+                break
+            # Someone else is resolving this name, use their answer
+            pending.wait()
+
+        if isinstance(result, socket.gaierror):
+            raise result
+        return result
+
+    def _cached(self, key: Tuple[str, int]) -> Optional[object]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _lookup(self, key: Tuple[str, int]) -> object:
+        result = None
+        ttl = self.negative_ttl
+        try:
+            result = socket.getaddrinfo(key[0], key[1], type=socket.SOCK_STREAM)
+            ttl = self.ttl
+        except socket.gaierror as e:
+            result = e
+        finally:
+            # Waiters retry the lookup themselves if it raised anything else
+            with self._lock:
+                if result is not None:
+                    self._entries[key] = (time.monotonic() + ttl, result)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                self._pending.pop(key).set()
+        return result
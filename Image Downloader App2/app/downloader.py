@@ -1,191 +1,1041 @@
-import os
-import time
-import requests
-from typing import List, Optional
-from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from PyQt6.QtCore import QObject, pyqtSignal, QRunnable, QThreadPool
-from .models import DownloadItem
-from .utils import (
-    validate_url,
-    convert_share_link,
-    sanitize_filename,
-    get_extension_from_url,
-    is_valid_image
-)
-
-class DownloadEngine(QObject):
-    progress = pyqtSignal(int, int, str)  # current, total, filename
-    log = pyqtSignal(str, str)  # message, level
-    finished = pyqtSignal(bool)  # success
-
-    def __init__(
-        self,
-        items: List[DownloadItem],
-        output_dir: str,
-        batch_size: int = 5,
-        max_retries: int = 3,
-        max_file_size: int = 100,  # MB
-        convert_to: str = "original"
-    ):
-        super().__init__()
-        self.items = items
-        self.output_dir = output_dir
-        self.batch_size = batch_size
-        self.max_retries = max_retries
-        self.max_file_size = max_file_size * 1024 * 1024  # Convert to bytes
-        self.convert_to = convert_to
-        self._cancel = False
-        self.failed_items = []
-        self.thread_pool = QThreadPool.globalInstance()
-
-    def start(self):
-        """Start the download process"""
-        try:
-            os.makedirs(self.output_dir, exist_ok=True)
-            self._download_all()
-            self.finished.emit(len(self.failed_items) == 0)
-        except Exception as e:
-            self.log.emit(f"Download failed: {str(e)}", "error")
-            self.finished.emit(False)
-
-    def cancel(self):
-        """Cancel the download process"""
-        self._cancel = True
-        self.log.emit("Cancelling download...", "info")
-
-    def _download_all(self):
-        """Download all items in batches"""
-        total = len(self.items)
-        completed = 0
-        self.failed_items = []
-
-        with ThreadPoolExecutor(max_workers=self.batch_size) as executor:
-            futures = {
-                executor.submit(self._download_item, item): item
-                for item in self.items
-            }
-
-            for future in as_completed(futures):
-                if self._cancel:
-                    break
-
-                item = futures[future]
-                try:
-                    result = future.result()
-                    if result:
-                        completed += 1
-                        self.progress.emit(completed, total, item.filename)
-                    else:
-                        self.failed_items.append(item)
-                except Exception as e:
-                    self.log.emit(f"Error processing {item.url}: {str(e)}", "error")
-                    item.error = str(e)
-                    self.failed_items.append(item)
-
-    def _download_item(self, item: DownloadItem) -> bool:
-        """Download a single item with retry logic"""
-        for attempt in range(self.max_retries + 1):
-            if self._cancel:
-                return False
-
-            try:
-                # Convert share links to direct download links
-                direct_url = convert_share_link(item.url)
-                if not direct_url:
-                    item.error = "Invalid URL or unsupported cloud service"
-                    return False
-
-                # Validate URL
-                if not validate_url(direct_url):
-                    item.error = "Invalid URL"
-                    return False
-
-                # Get filename if not provided
-                if not item.filename:
-                    item.filename = self._generate_filename(direct_url)
-
-                # Check for file existence and handle collisions
-                filepath = self._get_unique_filepath(item.filename)
-
-                # Download with streaming to handle large files
-                with requests.get(direct_url, stream=True, timeout=30) as response:
-                    response.raise_for_status()
-
-                    # Check file size
-                    content_length = int(response.headers.get('content-length', 0))
-                    if content_length > self.max_file_size:
-                        item.error = f"File too large ({content_length/1024/1024:.1f}MB > {self.max_file_size/1024/1024:.1f}MB)"
-                        return False
-
-                    # Check if it's actually an image
-                    if not is_valid_image(response.headers.get('content-type', ''), response.content[:1024]):
-                        item.error = "URL does not point to a valid image"
-                        return False
-
-                    # Stream download
-                    with open(filepath, 'wb') as f:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            if self._cancel:
-                                return False
-                            if chunk:
-                                f.write(chunk)
-
-                # If we need to convert the image
-                if self.convert_to != "original":
-                    self._convert_image(filepath)
-
-                self.log.emit(f"Downloaded {item.filename}", "info")
-                return True
-
-            except Exception as e:
-                if attempt < self.max_retries:
-                    wait_time = 2 ** attempt  # Exponential backoff
-                    self.log.emit(
-                        f"Attempt {attempt + 1} failed for {item.url}. Retrying in {wait_time}s...",
-                        "warning"
-                    )
-                    time.sleep(wait_time)
-                else:
-                    item.error = str(e)
-                    self.log.emit(
-                        f"Failed to download {item.url} after {self.max_retries} attempts: {str(e)}",
-                        "error"
-                    )
-                    return False
-
-        return False
-
-    def _generate_filename(self, url: str) -> str:
-        """Generate a filename from URL"""
-        # Extract filename from URL
-        filename = url.split('/')[-1].split('?')[0]
-        
-        # If no extension or invalid, try to get from content type
-        ext = get_extension_from_url(url)
-        if not filename.endswith(ext):
-            filename = f"{filename}.{ext}" if ext else f"{filename}.jpg"
-        
-        return sanitize_filename(filename)
-
-    def _get_unique_filepath(self, filename: str) -> str:
-        """Handle filename collisions by adding counters"""
-        base, ext = os.path.splitext(filename)
-        counter = 1
-        filepath = os.path.join(self.output_dir, filename)
-        
-        while os.path.exists(filepath):
-            filepath = os.path.join(self.output_dir, f"{base}_{counter}{ext}")
-            counter += 1
-            
-        return filepath
-
-    def _convert_image(self, filepath: str):
-        """Convert image to specified format if needed"""
-        # Implementation would use PIL/Pillow to convert formats
-        # This is a placeholder for the actual conversion logic
-        if self.convert_to == "jpeg":
-            pass  # Convert to JPEG
-        elif self.convert_to == "png":
-            pass  # Convert to PNG
-        # etc.
\ No newline at end of file
+import itertools
+import os
+import threading
+import time
+import requests
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from pathlib import Path
+from dataclasses import dataclass, field
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from .constants import (
+    ADAPTIVE_MAX_CONCURRENCY,
+    ADAPTIVE_MIN_CONCURRENCY,
+    CANCEL_GRACE,
+    DEFAULT_HOST_LIMITS,
+    LEASE_BATCH,
+    LEASE_POLL_INTERVAL,
+    LEASE_SECONDS,
+    NEGATIVE_CACHE_MAX_ENTRIES,
+    PRIORITY_HIGH,
+    PRIORITY_LOW,
+    RETRY_DELAYS,
+    PRIORITY_NORMAL,
+    SUBMIT_WINDOW_FACTOR,
+    SUPPORTED_IMAGE_EXTENSIONS
+)
+from .blobstore import BLOB_DIRNAME, BlobStore, link_or_copy, new_hasher, same_content
+from .convert import ConversionPool, output_extension
+from .httpcache import CacheEntry, ValidatorCache
+from .journal import BatchJournal, DONE, FAILED, IN_PROGRESS, QUEUED, item_key
+from .metrics import DownloadMetrics, begin_request_timings
+from .models import DownloadItem, ImageConversionSettings, ProgressSnapshot
+from .names import NameIndex
+from .negcache import NegativeCache
+from .progress import ProgressAggregator
+from .ratelimit import ConcurrencyBounds, HostLimiter
+from .resume import ResumeState, part_path
+from .retry import HostBreakers, RetryPolicy, error_retry_after, error_status, is_transient
+from .scheduler import HostScheduler, priority_lane
+from .workqueue import LeaseQueue, SharedNames
+from .session import HostSessionPool, PoolStats
+from .streaming import BodyReader, preallocate
+from .utils import (
+    validate_url,
+    convert_share_link,
+    sanitize_filename,
+    get_extension_from_url,
+    get_extension_from_response,
+    get_host,
+    is_valid_image,
+    normalize_url,
+    SNIFF_LENGTH
+)
+
+@dataclass
+class AttemptState:
+    """What an item's download attempts share: the retry count and the partial file to resume"""
+    attempt: int = 0
+    filepath: Optional[str] = None
+    resume: Optional[ResumeState] = None
+    revalidated: bool = False
+    started: float = field(default_factory=time.monotonic)
+    dispatched: float = 0.0  # When the current attempt was handed to a worker
+    ttfb: Optional[float] = None  # Time to first byte of the current attempt
+
+class DownloadCore:
+    """
+    Download engine with no Qt dependency.
+
+    Reports through two callbacks, so the same engine runs behind the GUI
+    (wrapped by qt_engine.DownloadEngine) and the headless CLI:
+
+    - on_snapshot(ProgressSnapshot): batched progress, a few times per second
+    - on_finished(bool): once at the end, after the last snapshot
+    """
+
+    def __init__(
+        self,
+        items: List[DownloadItem],
+        output_dir: str,
+        batch_size: int = 5,
+        max_retries: int = 3,
+        max_file_size: int = 100,  # MB
+        convert_to: str = "original",
+        host_limits: Optional[Dict[str, Dict[str, float]]] = None,
+        use_journal: bool = True,
+        resume: bool = False,
+        dedup: bool = False,
+        blob_dir: Optional[str] = None,
+        cache_path: Optional[str] = None,
+        cache_max_entries: int = 100000,
+        negative_cache_path: Optional[str] = None,
+        negative_cache_max_entries: int = NEGATIVE_CACHE_MAX_ENTRIES,
+        bypass_negative_cache: bool = False,
+        conversion: Optional[ImageConversionSettings] = None,
+        adaptive_concurrency: bool = False,
+        min_concurrency: int = ADAPTIVE_MIN_CONCURRENCY,
+        max_concurrency: int = ADAPTIVE_MAX_CONCURRENCY,
+        priority: int = PRIORITY_NORMAL,
+        conversion_workers: Optional[int] = None,
+        shard: Optional[int] = None,
+        names: Optional[NameIndex] = None,
+        queue_path: Optional[str] = None,
+        lease_seconds: float = LEASE_SECONDS,
+        on_snapshot: Optional[Callable[[ProgressSnapshot], None]] = None,
+        on_finished: Optional[Callable[[bool], None]] = None
+    ):
+        self.items = items
+        self.output_dir = output_dir
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.max_file_size = max_file_size * 1024 * 1024  # Convert to bytes
+        self.convert_to = convert_to
+        if conversion is None and convert_to != "original":
+            # Format change only, keep the original dimensions
+            conversion = ImageConversionSettings(output_format=convert_to, max_width=0, max_height=0)
+        self.conversion = conversion
+        self.converter: Optional[ConversionPool] = None
+        self.conversion_workers = conversion_workers
+        self._conversions: Dict[int, Future] = {}
+        self.host_limits = DEFAULT_HOST_LIMITS if host_limits is None else host_limits
+        # Adaptive mode: each host's concurrency starts at batch_size and
+        # moves between the bounds with its latency and error rate
+        self.adaptive_concurrency = adaptive_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limiter: Optional[HostLimiter] = None
+        # Lane of items without a priority of their own
+        self.priority = priority
+        # Items from add_items(), queued by the dispatcher on its next turn
+        self._added: Deque[DownloadItem] = deque()
+        self._added_lock = threading.Lock()
+        self._closed = False
+        self.use_journal = use_journal
+        self.resume = resume
+        self.journal: Optional[BatchJournal] = None
+        # Sharded mode: this core runs one shard of a batch, keeping its own
+        # journal and metrics files and taking names from an allocator
+        # shared with the other shards
+        self.shard = shard
+        self.names = names
+        # Work queue mode: `items` are added to a LeaseQueue shared with
+        # engines on other machines, and this engine downloads whatever it
+        # leases from it; self.items then holds the leased items
+        self.queue_path = queue_path
+        self.lease_seconds = lease_seconds
+        self.work_queue: Optional[LeaseQueue] = None
+        self._keys: Dict[int, str] = {}
+        self.dedup = dedup
+        self.blob_dir = blob_dir or os.path.join(output_dir, BLOB_DIRNAME)
+        self.blob_store: Optional[BlobStore] = None
+        # URL dedup: first copy in flight, repeats waiting on it, settled outcomes
+        self._leaders: Dict[str, DownloadItem] = {}
+        self._leader_urls: Dict[int, str] = {}
+        self._followers: Dict[str, List[DownloadItem]] = {}
+        self._resolved: Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]] = {}
+        self._outputs: Dict[int, str] = {}
+        # Every output path of this batch, so only files of earlier runs are reused
+        self._claimed: Set[str] = set()
+        self.cache_path = cache_path
+        self.cache_max_entries = cache_max_entries
+        self.cache: Optional[ValidatorCache] = None
+        # Dead URLs from earlier runs fail at once unless bypassed; a bypassed
+        # run still records new failures and clears URLs that work again
+        self.negative_cache_path = negative_cache_path
+        self.negative_cache_max_entries = negative_cache_max_entries
+        self.bypass_negative_cache = bypass_negative_cache
+        self.negative_cache: Optional[NegativeCache] = None
+        self.duplicate_urls = 0
+        self.retry_policy = RetryPolicy(RETRY_DELAYS)
+        self.breakers = HostBreakers()
+        self._attempts: Dict[int, AttemptState] = {}
+        self._cancel = False
+        # Resolved by cancel() and add_items() to wake the dispatcher, replaced once seen
+        self._wakeup: Future = Future()
+        # Responses being streamed, closed by cancel() to unblock their workers
+        self._responses: Dict[int, requests.Response] = {}
+        self._responses_lock = threading.Lock()
+        self.failed_items = []
+        self.completed = 0
+        # Keep-alive pools hold a connection for every worker that may hit a host
+        self.sessions = HostSessionPool(pool_size=self._worker_count())
+        self.metrics = DownloadMetrics(connection_stats=self._connection_stats)
+        self.on_snapshot = on_snapshot or (lambda snapshot: None)
+        self.on_finished = on_finished or (lambda success: None)
+        # Progress and log lines go out as batched snapshots, not per event
+        self.events = ProgressAggregator(
+            0 if queue_path else len(items), lambda snapshot: self.on_snapshot(snapshot)
+        )
+
+    def start(self):
+        """Start the download process"""
+        self.events.start()
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            if self.queue_path:
+                self.work_queue = LeaseQueue(self.queue_path, self.lease_seconds)
+                if self.names is None:
+                    # Other machines may write to the same directory
+                    self.names = SharedNames(self.work_queue, self.output_dir)
+            # One directory listing up front, names are reserved in memory from here on
+            if self.names is None:
+                self.names = NameIndex(self.output_dir)
+            # The work queue keeps every item's state itself
+            if self.use_journal and not self.work_queue:
+                self.journal = BatchJournal(self.output_dir, shard=self.shard)
+                if not self.resume:
+                    self.journal.reset()
+            if self.dedup:
+                self.blob_store = BlobStore(self.blob_dir)
+            if self.cache_path:
+                self.cache = ValidatorCache(self.cache_path, self.cache_max_entries)
+            if self.negative_cache_path:
+                self.negative_cache = NegativeCache(self.negative_cache_path, self.negative_cache_max_entries)
+            if self.conversion:
+                self.converter = ConversionPool(self.conversion, workers=self.conversion_workers)
+            self._download_all()
+            self._log_summary()
+            self._write_metrics()
+            success = len(self.failed_items) == 0
+        except Exception as e:
+            self._log(f"Download failed: {str(e)}", "error")
+            success = False
+        finally:
+            self.sessions.close()
+            if self.converter:
+                self.converter.close(cancel=self._cancel)
+            if self.journal:
+                self.journal.close()
+            if self.work_queue:
+                # Hands unfinished leases back after a cancel or crash
+                self.work_queue.close()
+            if self.cache:
+                self.cache.close()
+            if self.negative_cache:
+                self.negative_cache.close()
+            # The final snapshot goes out before finished
+            self.events.close()
+        self.on_finished(success)
+
+    def cancel(self):
+        """
+        Cancel the download process.
+
+        Safe to call from any thread. Queued and backing-off items are
+        dropped, in-flight responses are shut down so blocked reads fail at
+        once, and the batch ends within about CANCEL_GRACE seconds; workers
+        still connecting are abandoned and remove their partial files when
+        they return.
+        """
+        if self._cancel:
+            return
+        self._cancel = True
+        self._log("Cancelling download...", "info")
+        self._wake()
+        with self._responses_lock:
+            responses = list(self._responses.values())
+        for response in responses:
+            self._abort_response(response)
+
+    def add_items(self, items: List[DownloadItem]) -> bool:
+        """
+        Add items to the batch while it runs. Safe to call from any thread.
+
+        They are queued in their priority lanes on the dispatcher's next turn,
+        so high priority items start as soon as a worker is free. Returns
+        False, adding nothing, once the batch has finished or was cancelled.
+        """
+        with self._added_lock:
+            if self._closed or self._cancel:
+                return False
+            self._added.extend(items)
+        self._wake()
+        return True
+
+    def _wake(self):
+        with self._added_lock:
+            if not self._wakeup.done():
+                self._wakeup.set_result(True)
+
+    def _batch_open(self, busy: bool) -> bool:
+        """Whether the dispatch loop goes on; once it runs out of work the batch is closed to add_items()"""
+        if busy and not self._cancel:
+            return True
+        with self._added_lock:
+            if self._added and not self._cancel:
+                return True
+            self._closed = True
+            return False
+
+    def _take_added(self, scheduler: HostScheduler, total: int):
+        """Queue the items add_items() received since the last call"""
+        with self._added_lock:
+            if self._wakeup.done() and not self._cancel:
+                self._wakeup = Future()
+            added = list(self._added)
+            self._added.clear()
+        if not added:
+            return
+        self.events.add_total(len(added))
+        for item in added:
+            index = len(self.items)
+            self.items.append(item)
+            if self._admit(item_key(index, item), item, total):
+                scheduler.add(item)
+        self._log(f"Added {len(added)} items to the running batch", "info")
+
+    @staticmethod
+    def _abort_response(response: requests.Response):
+        """Unblock a worker reading this response from another thread"""
+        # urllib3 2.3+ can shut the socket down under a blocked read;
+        # closing is the best older versions can do
+        shutdown = getattr(response.raw, 'shutdown', None)
+        try:
+            if shutdown is not None:
+                shutdown()
+            else:
+                response.close()
+        except Exception:
+            pass
+
+    def _log(self, message: str, level: str = "info"):
+        self.events.message(message, level)
+
+    def _progress(self, filename: Optional[str] = None):
+        self.events.progress(self.completed, len(self.failed_items), filename)
+
+    def _log_summary(self):
+        """Log the finished-batch summary including connection reuse"""
+        self._log(
+            f"Batch finished: {self.completed}/{len(self.items)} downloaded, "
+            f"{len(self.failed_items)} failed",
+            "info"
+        )
+        stats = self._connection_stats()
+        self._log(
+            f"Connections: {stats.requests} requests over {stats.connections} connections "
+            f"(reuse {stats.reuse_ratio:.0%}, {stats.handshakes_avoided} handshakes avoided)",
+            "info"
+        )
+        if stats.dns_hits or stats.dns_misses:
+            self._log(
+                f"DNS cache: {stats.dns_hits} hits, {stats.dns_misses} lookups "
+                f"(hit rate {stats.dns_hit_rate:.0%})",
+                "info"
+            )
+        if self.work_queue:
+            counts = self.work_queue.counts()
+            self._log(
+                f"Work queue: {counts.get(DONE, 0)} done, {counts.get(FAILED, 0)} failed, "
+                f"{counts.get(QUEUED, 0)} queued across all workers; "
+                f"{self.work_queue.recovered} expired leases taken over",
+                "info"
+            )
+        if self.cache:
+            self._log(
+                f"Revalidation cache: {self.cache.hits} not modified, {self.cache.misses} downloaded",
+                "info"
+            )
+        if self.negative_cache:
+            self._log(
+                f"Negative cache: {self.negative_cache.hits} known dead URLs skipped, "
+                f"{self.negative_cache.stored} newly recorded",
+                "info"
+            )
+        if self.blob_store:
+            self._log(
+                f"Dedup: {self.duplicate_urls} repeated URLs served without downloading, "
+                f"{self.blob_store.duplicates} identical files stored once",
+                "info"
+            )
+        if self.adaptive_concurrency:
+            adapted = sorted(
+                (m.concurrency_peak, host, m.concurrency_limit)
+                for host, m in self.metrics.hosts.items() if m.concurrency_limit is not None
+            )[::-1][:3]
+            if adapted:
+                self._log(
+                    "Adaptive concurrency (final/peak): "
+                    + ", ".join(f"{host} {limit}/{peak}" for peak, host, limit in adapted),
+                    "info"
+                )
+
+    def _write_metrics(self):
+        """Save the batch's metrics as JSON and Prometheus text in the output directory"""
+        slowest = self.metrics.slowest_hosts()
+        if slowest:
+            self._log(
+                "Slowest hosts (p90 time to first byte): "
+                + ", ".join(f"{host} {seconds:.2f}s" for host, seconds in slowest),
+                "info"
+            )
+        try:
+            json_path, _ = self.metrics.write(self.output_dir, self.shard)
+            self._log(f"Metrics saved to {json_path}", "info")
+        except OSError as e:
+            self._log(f"Failed to save metrics: {e}", "warning")
+
+    def _connection_stats(self) -> PoolStats:
+        """Connection reuse counters for the summary"""
+        return self.sessions.stats()
+
+    def _create_limiter(self) -> HostLimiter:
+        """Per-host limits for a batch, adaptive if enabled"""
+        bounds = None
+        if self.adaptive_concurrency:
+            bounds = ConcurrencyBounds(self.batch_size, self.min_concurrency, self.max_concurrency)
+        self.limiter = HostLimiter(self.host_limits, adaptive=bounds)
+        return self.limiter
+
+    def _worker_count(self) -> int:
+        """Download threads; in adaptive mode enough for any host's limit to grow into"""
+        if self.adaptive_concurrency:
+            return max(self.batch_size, self.max_concurrency)
+        return self.batch_size
+
+    def _download_all(self):
+        """Download all items, dispatching per host under its limits"""
+        total = len(self.items)
+        self.completed = 0
+        self.failed_items = []
+        workers = self._worker_count()
+
+        # Items are pulled lazily so only a small multiple of the worker
+        # count is ever buffered, however many rows the batch has
+        scheduler = HostScheduler(
+            self._create_limiter(),
+            sources=self._pending_sources(total),
+            window=workers * SUBMIT_WINDOW_FACTOR,
+            breakers=self.breakers,
+            default_priority=self.priority
+        )
+
+        executor = ThreadPoolExecutor(max_workers=workers)
+        running = {}
+        converting = {}
+        try:
+            while self._batch_open(scheduler.has_work or running or converting):
+                self._take_added(scheduler, total)
+                # Fill free workers with items whose host is not throttled
+                wait_time = None
+                while len(running) < workers:
+                    item, wait_time = scheduler.acquire()
+                    if item is None:
+                        break
+                    self._dispatch(item)
+                    running[executor.submit(self._attempt, item)] = item
+
+                if not running and not converting:
+                    # Every queued host is throttled or backing off, sleep until
+                    # one is ready or the batch is cancelled
+                    wait([self._wakeup], timeout=wait_time or 0.05)
+                    continue
+
+                wakeup = self._wakeup
+                done, _ = wait(
+                    list(running) + list(converting) + [wakeup],
+                    timeout=wait_time,
+                    return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    if self._cancel:
+                        # Whatever is left is sorted out by _drain
+                        break
+                    if future is wakeup:
+                        continue
+                    if future in converting:
+                        self._finish_conversion(converting.pop(future), future, total)
+                        continue
+                    item = running.pop(future)
+                    scheduler.release(item)
+                    self._finish_item(item, future, total, scheduler)
+                    # The worker has moved on, the item settles when its conversion does
+                    conversion = self._conversions.pop(id(item), None)
+                    if conversion is not None:
+                        converting[conversion] = item
+
+            if running:
+                self._drain(wait(running, timeout=CANCEL_GRACE)[0], running, total)
+        finally:
+            # After a cancel, don't wait for workers stuck connecting; they
+            # see the flag and clean up when they return
+            executor.shutdown(wait=not self._cancel, cancel_futures=True)
+
+    def _pending_sources(self, total: int) -> Dict[int, Iterator[DownloadItem]]:
+        """One lazy source of pending items per priority lane used in the batch"""
+        if self.work_queue:
+            added = self.work_queue.enqueue(self.items, self.priority)
+            if self.items:
+                self._log(f"Queued {added} of {len(self.items)} items in {self.queue_path}", "info")
+            self.items = []
+            return {lane: self._iter_leased(total, lane) for lane in range(PRIORITY_LOW, PRIORITY_HIGH + 1)}
+
+        done = self.journal.done_items() if self.journal and self.resume else {}
+        if done:
+            self._log(f"Resuming batch: {len(done)} items finished in an earlier run", "info")
+
+        lanes = {priority_lane(item.priority, self.priority) for item in self.items}
+        if len(lanes) <= 1:
+            # One lane, no need to filter
+            return {lanes.pop() if lanes else self.priority: self._iter_pending(total, done)}
+        return {lane: self._iter_pending(total, done, lane) for lane in sorted(lanes)}
+
+    def _iter_pending(self, total: int, done: Dict[str, str], lane: Optional[int] = None) -> Iterator[DownloadItem]:
+        """
+        Yield the items that need downloading, one at a time.
+
+        Skips items of other lanes than `lane` (if given) and items a resumed
+        journal has as done, and with dedup on, holds back repeats of a URL
+        until its first copy settles. The scheduler pulls from this lazily,
+        so per-item bookkeeping only exists for the items buffered or in
+        flight.
+        """
+        skipped = 0
+        # Items appended by add_items() are queued by _take_added instead
+        for index, item in enumerate(itertools.islice(self.items, total)):
+            if lane is not None and priority_lane(item.priority, self.priority) != lane:
+                continue
+            key = item_key(index, item)
+            if key in done:
+                item.filename = done[key] or item.filename
+                self.completed += 1
+                skipped += 1
+                self.metrics.record_skipped()
+                continue
+            if skipped:
+                self._progress(item.filename)
+                skipped = 0
+            if self._admit(key, item, total):
+                yield item
+
+        if skipped:
+            self._progress()
+
+    def _iter_leased(self, total: int, lane: int) -> Iterator[Optional[DownloadItem]]:
+        """
+        Yield items leased from the work queue for one lane, a few at a time.
+
+        Yields None while everything left is leased by other workers, whose
+        items come back if they die, and stops once nothing is left.
+        """
+        next_poll = 0.0
+        while True:
+            now = time.monotonic()
+            if now < next_poll:
+                yield None
+                continue
+            leased = self.work_queue.lease(LEASE_BATCH, lane)
+            if not leased:
+                if not self.work_queue.outstanding(lane):
+                    return
+                next_poll = now + LEASE_POLL_INTERVAL
+                yield None
+                continue
+            self.events.add_total(len(leased))
+            for key, item in leased:
+                self.items.append(item)
+                if self._admit(key, item, total):
+                    yield item
+
+    def _admit(self, key: str, item: DownloadItem, total: int) -> bool:
+        """
+        Journal an item as queued; False if it is a repeat waiting on, or
+        settled by, its URL's first copy, or a known dead URL, which fails
+        here without taking a host slot or rate-limit token.
+        """
+        self._keys[id(item)] = key
+        self._record(item, QUEUED)
+
+        if not self._check_negative_cache(item):
+            self._settle(item, False, total)
+            return False
+
+        if self.dedup:
+            # Repeats of a URL reuse the first copy instead of downloading
+            url = normalize_url(item.url)
+            if url in self._leaders:
+                self._followers.setdefault(url, []).append(item)
+                return False
+            if url in self._resolved:
+                self._settle_duplicate(item, url, total)
+                return False
+            self._leaders[url] = item
+            self._leader_urls[id(item)] = url
+        return True
+
+    def _drain(self, done: Iterable, running: dict, total: int):
+        """After a cancel, still count the in-flight items that finished in time; the rest stay unfinished"""
+        for future in done:
+            if future.cancelled() or future.exception() is not None:
+                continue
+            if future.result():
+                self._finish_item(running[future], future, total)
+
+    def _dispatch(self, item: DownloadItem):
+        """Mark an item as handed to a worker"""
+        self._record(item, IN_PROGRESS)
+        state = self._attempt_state(item)
+        state.dispatched = time.monotonic()
+        state.ttfb = None
+
+    def _record(self, item: DownloadItem, state: str):
+        """Journal a state transition if journaling is on"""
+        if self.journal:
+            self.journal.record(self._keys[id(item)], item, state)
+
+    def _finish_item(self, item: DownloadItem, future, total: int, scheduler: Optional[HostScheduler] = None):
+        """
+        Record the outcome of a finished download attempt.
+
+        A transient error sends the item back to the scheduler with a jittered
+        backoff (or the server's Retry-After) instead of sleeping in a worker,
+        so the workers keep serving other items meanwhile.
+        """
+        state = self._attempt_state(item)
+        host = get_host(item.url)
+        breaker = self.breakers.get(host)
+        try:
+            result = future.result()
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            transient = is_transient(e)
+            if error_status(e) is None:
+                self.metrics.record_error(host)
+            self._adapt_concurrency(host, state, congested=transient)
+            if not transient:
+                # The host answered, only this URL is bad
+                breaker.record_success()
+            elif breaker.record_failure(time.monotonic()):
+                if breaker.given_up:
+                    self._log(f"Giving up on {host} after repeated failures", "error")
+                else:
+                    self._log(
+                        f"Pausing {host} for {breaker.cooldown:.0f}s after repeated failures",
+                        "warning"
+                    )
+
+            if transient and scheduler is not None and state.attempt < self.max_retries and not self._cancel:
+                delay = self.retry_policy.delay(state.attempt, error_retry_after(e))
+                state.attempt += 1
+                self.metrics.record_retry(host)
+                self._log(
+                    f"Attempt {state.attempt} failed for {item.url}: {error}. Retrying in {delay:.1f}s...",
+                    "warning"
+                )
+                self._record(item, QUEUED)
+                scheduler.defer(item, delay)
+                return
+
+            item.error = error
+            self._log(
+                f"Failed to download {item.url} after {state.attempt + 1} attempts: {error}",
+                "error"
+            )
+            self._discard_part(state.filepath)
+            if self.negative_cache:
+                self.negative_cache.store(normalize_url(convert_share_link(item.url)), e)
+            result = False
+        else:
+            self._adapt_concurrency(host, state, congested=False)
+            if result or state.ttfb is not None:
+                # The host answered; a False result is about this URL only
+                breaker.record_success()
+            else:
+                # No request went out, the next item gets to probe instead
+                breaker.release_probe()
+            if result and self.negative_cache and self.bypass_negative_cache:
+                self.negative_cache.forget(normalize_url(convert_share_link(item.url)))
+            if result and id(item) in self._conversions:
+                return
+        self._settle(item, result, total)
+
+    def _adapt_concurrency(self, host: str, state: AttemptState, congested: bool):
+        """Feed an attempt's outcome to the host's adaptive limit and report the limits"""
+        aimd = self.limiter.adaptive_limit(host) if self.limiter else None
+        if aimd is None:
+            return
+        if congested:
+            aimd.on_congestion(state.dispatched)
+        elif state.ttfb is not None:
+            aimd.on_success(state.ttfb)
+        self.metrics.record_concurrency(host, aimd.current)
+        self.events.concurrency(self.limiter.active_limits())
+
+    def _finish_conversion(self, item: DownloadItem, future, total: int):
+        """Settle a downloaded item once its conversion has finished"""
+        try:
+            filepath = future.result()
+        except Exception as e:
+            item.error = f"Conversion failed: {str(e)}"
+            self._log(f"Could not convert {item.filename}: {str(e)}", "error")
+            self._settle(item, False, total)
+            return
+
+        source = self._outputs[id(item)]
+        if filepath != source:
+            self.names.release(source)
+        self._outputs[id(item)] = filepath
+        self._claimed.add(os.path.abspath(filepath))
+        item.filename = os.path.basename(filepath)
+
+        # Cache the converted file, it is what a 304 on the next run should reuse
+        resume = self._attempt_state(item).resume
+        if self.cache and resume:
+            url = normalize_url(convert_share_link(item.url))
+            self.cache.store(url, resume.etag, resume.last_modified, filepath)
+        self._settle(item, True, total)
+
+    def _queue_conversion(self, item: DownloadItem, filepath: str):
+        """Hand a finished download to the conversion pool, blocking while its queue is full"""
+        base, ext = os.path.splitext(filepath)
+        new_ext = output_extension(self.conversion, filepath)
+        target = filepath
+        if new_ext.lower() != ext.lower():
+            target = self.names.reserve(os.path.basename(base) + new_ext)
+        self._conversions[id(item)] = self.converter.submit(filepath, target)
+
+    def _attempt_state(self, item: DownloadItem) -> AttemptState:
+        state = self._attempts.get(id(item))
+        if state is None:
+            state = self._attempts[id(item)] = AttemptState()
+        return state
+
+    def _settle(self, item: DownloadItem, result: bool, total: int):
+        """Count an item as done or failed, then resolve any repeats of its URL"""
+        if result:
+            self.completed += 1
+            self._record(item, DONE)
+        else:
+            self._record(item, FAILED)
+            self.failed_items.append(item)
+        # Drop per-item bookkeeping so it doesn't grow with the batch
+        key = self._keys.pop(id(item), None)
+        if self.work_queue and key is not None:
+            self.work_queue.finish(key, item, result)
+        state = self._attempts.pop(id(item), None)
+        latency = time.monotonic() - state.started if state else None
+        self.metrics.record_item(get_host(item.url), result, latency)
+        self._progress(item.filename)
+        output = self._outputs.pop(id(item), None)
+
+        url = self._leader_urls.pop(id(item), None)
+        if url is not None:
+            del self._leaders[url]
+            self._resolved[url] = (output if result else None, item.error, item.filename)
+            for follower in self._followers.pop(url, []):
+                self._settle_duplicate(follower, url, total)
+
+    def _settle_duplicate(self, item: DownloadItem, url: str, total: int):
+        """Finish a repeated URL from the outcome of its first copy"""
+        output, error, filename = self._resolved[url]
+        self.duplicate_urls += 1
+        if output is None:
+            item.error = error
+            self._settle(item, False, total)
+            return
+
+        if not item.filename:
+            item.filename = filename
+        elif self.conversion:
+            # Same name, but the extension of the converted copy it links to
+            item.filename = os.path.splitext(item.filename)[0] + os.path.splitext(output)[1]
+        try:
+            # A re-run finds the copy it made last time instead of adding another
+            if self._existing_copy(item.filename, output) is None:
+                filepath = self.names.reserve(item.filename)
+                link_or_copy(output, filepath)
+                self._claimed.add(os.path.abspath(filepath))
+            result = True
+        except Exception as e:
+            item.error = str(e)
+            result = False
+        self._settle(item, result, total)
+
+    def _existing_copy(self, filename: str, source: str) -> Optional[str]:
+        """
+        Claim a file an earlier run left as filename, or as one of its
+        collision-numbered variants, if it holds the same bytes as source
+        and isn't an output of this batch yet.
+        """
+        base, ext = os.path.splitext(filename)
+        counter = 0
+        while True:
+            path = os.path.abspath(os.path.join(self.output_dir, f"{base}_{counter}{ext}" if counter else filename))
+            if not os.path.exists(path):
+                return None
+            if path not in self._claimed and same_content(path, source):
+                self._claimed.add(path)
+                return path
+            counter += 1
+
+    def _check_negative_cache(self, item: DownloadItem) -> bool:
+        """False with item.error set if an earlier run found its URL dead and the entry hasn't expired"""
+        if not self.negative_cache or self.bypass_negative_cache:
+            return True
+        direct_url = convert_share_link(item.url)
+        if not direct_url:
+            # Fails as an invalid URL when downloaded
+            return True
+        entry = self.negative_cache.lookup(normalize_url(direct_url))
+        if entry is None:
+            return True
+        item.error = entry.describe()
+        return False
+
+    def _use_cached(self, item: DownloadItem, entry: CacheEntry) -> bool:
+        """Satisfy an item from the revalidated file of an earlier run"""
+        self.cache.record_hit(entry)
+        if not item.filename:
+            item.filename = os.path.basename(entry.path)
+        elif self.conversion:
+            # Same name, but the extension of the converted copy that was cached
+            item.filename = os.path.splitext(item.filename)[0] + os.path.splitext(entry.path)[1]
+        filepath = os.path.abspath(os.path.join(self.output_dir, item.filename))
+        if entry.path != filepath:
+            filepath = self.names.reserve(item.filename)
+            link_or_copy(entry.path, filepath)
+        self._claimed.add(os.path.abspath(filepath))
+        self._outputs[id(item)] = filepath
+        self._log(f"Not modified, reused {item.filename}", "info")
+        return True
+
+    def _store_download(self, item: DownloadItem, partpath: str, filepath: str, hasher):
+        """Move a completed .part file to its final name, through the blob store if enabled"""
+        if self.blob_store is None:
+            os.replace(partpath, filepath)
+        else:
+            digest = hasher.hexdigest()
+            self.blob_store.add(partpath, digest)
+            self.blob_store.materialize(digest, filepath)
+        self._outputs[id(item)] = filepath
+        self._claimed.add(os.path.abspath(filepath))
+
+    def _attempt(self, item: DownloadItem) -> bool:
+        """Worker entry point: one attempt, cleaning up after itself if the batch was cancelled meanwhile"""
+        result = False
+        try:
+            result = self._download_item(item)
+            return result
+        except Exception:
+            if self._cancel:
+                # Most likely the aborted response, not a real failure
+                return False
+            raise
+        finally:
+            if self._cancel and not result:
+                state = self._attempts.get(id(item))
+                self._discard_part(state.filepath if state else None)
+
+    def _download_item(self, item: DownloadItem) -> bool:
+        """
+        Make one download attempt for an item.
+
+        Returns False with item.error set for failures retrying can't fix.
+        Other errors propagate so _finish_item can schedule the retry.
+        """
+        state = self._attempt_state(item)
+        if self._cancel:
+            return False
+
+        # Convert share links to direct download links
+        direct_url = convert_share_link(item.url)
+        if not direct_url:
+            item.error = "Invalid URL or unsupported cloud service"
+            return False
+
+        # Validate URL
+        if not validate_url(direct_url):
+            item.error = "Invalid URL"
+            return False
+
+        if self.breakers.get(get_host(item.url)).given_up:
+            item.error = "Host unavailable after repeated failures"
+            return False
+
+        cache_key = normalize_url(direct_url)
+
+        # Ask for the missing tail if a previous attempt left a partial file;
+        # one that failed before naming the file has nothing to resume
+        resume = state.resume
+        offset = resume.resume_offset(part_path(state.filepath)) if resume and state.filepath else 0
+        headers = resume.request_headers(offset) if offset else {}
+
+        # Revalidate a copy from an earlier run instead of downloading it again
+        cached = None
+        if not state.revalidated and self.cache:
+            cached = self.cache.lookup(cache_key)
+            if cached:
+                headers.update(cached.conditional_headers())
+
+        # Download with streaming to handle large files
+        session = self.sessions.get(direct_url)
+        host = get_host(item.url)
+        timings = begin_request_timings()
+        requested = time.perf_counter()
+        with session.get(direct_url, headers=headers, stream=True, timeout=30) as response, \
+                self._registered(item, response):
+            headers_at = time.perf_counter()
+            timings.ttfb = state.ttfb = headers_at - requested - timings.setup
+            self.metrics.record_request(host, timings, response.status_code)
+            if cached and response.status_code == 304:
+                return self._use_cached(item, cached)
+            if self.cache and not state.revalidated:
+                self.cache.record_miss()
+            state.revalidated = True
+            response.raise_for_status()
+
+            body = BodyReader(response)
+            head = b''
+            if offset and resume.accepts(response.status_code, response.headers, offset):
+                mode = 'ab'
+                self._log(f"Resuming {item.filename} at {offset/1024/1024:.1f}MB", "info")
+            else:
+                self._reject_partial(response.status_code, state)
+                # Fresh download, or the file changed since the last attempt
+                mode = 'wb'
+                resume = state.resume = ResumeState.from_headers(response.headers)
+
+                # Check file size
+                content_length = int(response.headers.get('content-length', 0))
+                if content_length > self.max_file_size:
+                    item.error = f"File too large ({content_length/1024/1024:.1f}MB > {self.max_file_size/1024/1024:.1f}MB)"
+                    return False
+
+                # Check if it's actually an image, sniffing only the first
+                # streamed bytes instead of buffering the whole body
+                head = body.read_head(SNIFF_LENGTH)
+                content_type = response.headers.get('content-type', '')
+                if not is_valid_image(content_type, head):
+                    item.error = "URL does not point to a valid image"
+                    return False
+
+                # Name the file from the headers and bytes already in hand,
+                # no separate HEAD request needed
+                if not item.filename:
+                    item.filename = self._generate_filename(direct_url, content_type, head)
+
+            # Reserve a collision-free name once per item so retries keep
+            # writing to the same .part file
+            if state.filepath is None:
+                state.filepath = self.names.reserve(item.filename)
+            filepath = state.filepath
+            partpath = part_path(filepath)
+
+            # Stream download, hashing as we go when deduplicating
+            hasher = new_hasher(partpath if mode == 'ab' else None) if self.blob_store else None
+            received = offset
+            with open(partpath, mode) as f:
+                preallocated = mode == 'wb' and preallocate(f, resume.length)
+                try:
+                    for chunk in itertools.chain((head,), body):
+                        if self._cancel:
+                            return False
+                        if chunk:
+                            # content-length may be missing or wrong, count what actually arrives
+                            received += len(chunk)
+                            if received > self.max_file_size:
+                                break
+                            f.write(chunk)
+                            self.events.add_bytes(len(chunk))
+                            if hasher:
+                                hasher.update(chunk)
+                finally:
+                    if preallocated:
+                        # Drop the reserved tail a short or aborted body didn't fill
+                        f.truncate()
+
+        self.metrics.record_transfer(host, time.perf_counter() - headers_at, received - offset)
+        if received > self.max_file_size:
+            item.error = f"File too large (over {self.max_file_size/1024/1024:.1f}MB)"
+            self._discard_part(filepath)
+            return False
+
+        if resume.length is not None and os.path.getsize(partpath) != resume.length:
+            raise IOError(f"Incomplete download ({os.path.getsize(partpath)} of {resume.length} bytes)")
+
+        # Only a complete file gets its final name
+        self._store_download(item, partpath, filepath, hasher)
+        if self.converter:
+            # Converted on the process pool while this worker moves on,
+            # cached once the converted file exists
+            self._queue_conversion(item, filepath)
+        elif self.cache:
+            self.cache.store(cache_key, resume.etag, resume.last_modified, filepath)
+
+        self._log(f"Downloaded {item.filename}", "info")
+        return True
+
+    @contextmanager
+    def _registered(self, item: DownloadItem, response: requests.Response):
+        """Make the response reachable by cancel() while it is being read"""
+        with self._responses_lock:
+            self._responses[id(item)] = response
+        if self._cancel:
+            # Cancelled while the request was on its way
+            self._abort_response(response)
+        try:
+            yield response
+        finally:
+            with self._responses_lock:
+                self._responses.pop(id(item), None)
+
+    def _generate_filename(self, url: str, content_type: str = '', first_bytes: bytes = b'') -> str:
+        """Generate a filename from URL and the response it returned"""
+        # Extract filename from URL
+        filename = url.split('/')[-1].split('?')[0]
+        
+        # Without an image extension in the URL, go by what the server sent
+        ext = get_extension_from_url(url)
+        if f".{ext}" not in SUPPORTED_IMAGE_EXTENSIONS:
+            ext = get_extension_from_response(content_type, first_bytes) or "jpg"
+        if not filename.lower().endswith(f".{ext}"):
+            filename = f"{filename}.{ext}"
+        
+        return sanitize_filename(filename)
+
+    def _reject_partial(self, status: int, state: AttemptState):
+        """
+        Refuse a 206 that doesn't continue the partial file.
+
+        Its body is only a tail, of a file that may have changed, and can't
+        be saved as a new download. The partial file is dropped and the
+        error is retried as a plain request without Range.
+        """
+        if status != 206:
+            return
+        self._discard_part(state.filepath)
+        state.filepath = None
+        state.resume = None
+        raise IOError("Partial response doesn't match the file being resumed, restarting the download")
+
+    def _discard_part(self, filepath: Optional[str]):
+        """Remove the partial file left behind by a failed download and free its name"""
+        if filepath:
+            self.names.release(filepath)
+        if filepath and os.path.exists(part_path(filepath)):
+            try:
+                os.remove(part_path(filepath))
+            except OSError:
+                pass
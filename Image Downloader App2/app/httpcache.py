@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+@dataclass
+class CacheEntry:
+    """Validators and local copy recorded for a previously downloaded URL"""
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    size: int
+    path: str
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Headers that let the server answer 304 if the file is unchanged"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+class ValidatorCache:
+    """
+    Persistent HTTP validator cache keyed by normalized URL.
+
+    Stores the ETag/Last-Modified a server sent with each download together
+    with the local file, so a re-run of the same sheet can revalidate with a
+    conditional request and reuse the file on 304. The index is capped at
+    max_entries and evicts the least recently used entries first.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT,"
+            " size INTEGER, path TEXT, last_used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used)")
+        self._db.commit()
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        """Entry for url whose local file still exists unchanged, else None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, etag, last_modified, size, path FROM entries WHERE url = ?",
+                (url,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        entry = CacheEntry(*row)
+        if not os.path.exists(entry.path) or os.path.getsize(entry.path) != entry.size:
+            # Local copy was deleted or edited, it can't stand in for the server's file
+            self.forget(url)
+            return None
+        return entry
+
+    def record_hit(self, entry: CacheEntry):
+        """Count a 304 and mark the entry as recently used"""
+        with self._lock:
+            self.hits += 1
+            self._db.execute(
+                "UPDATE entries SET last_used = ? WHERE url = ?", (time.time(), entry.url)
+            )
+            self._db.commit()
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def store(self, url: str, etag: Optional[str], last_modified: Optional[str], path: str):
+        """Remember a completed download's validators; skipped if the server sent none"""
+        if not etag and not last_modified:
+            return
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (url, etag, last_modified, size, path, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, os.path.getsize(path), os.path.abspath(path), time.time())
+            )
+            self._writes += 1
+            # Amortize the eviction query over many inserts
+            if self._writes % 1000 == 0:
+                self._evict()
+            self._db.commit()
+
+    def forget(self, url: str):
+        with self._lock:
+            self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self._db.commit()
+
+    def _evict(self):
+        """Drop least recently used entries beyond max_entries"""
+        count = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM entries WHERE url IN"
+                " (SELECT url FROM entries ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+
+    def close(self):
+        with self._lock:
+            self._evict()
+            self._db.commit()
+            self._db.close()
@@ -0,0 +1,132 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from .models import DownloadItem
+from .utils import shard_filename
+
+QUEUED = "queued"
+IN_PROGRESS = "in_progress"
+DONE = "done"
+FAILED = "failed"
+
+JOURNAL_FILENAME = ".download_journal.sqlite"
+
+def item_key(index: int, item: DownloadItem) -> str:
+    """Stable identity of a spreadsheet row across runs of the same batch"""
+    return f"{index}\t{item.url}\t{item.filename or ''}"
+
+class BatchJournal:
+    """
+    Crash-safe log of every item's state for one output directory.
+
+    State transitions are buffered in memory and written by a background
+    thread in one transaction per flush, so a 200k-row batch costs a few
+    hundred commits rather than one per transition. The database runs in
+    WAL mode, so a crash loses at most the last flush interval.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        flush_interval: float = 0.5,
+        flush_size: int = 1000,
+        shard: Optional[int] = None
+    ):
+        # Shards of one batch keep separate journals, keyed by their own item order
+        self.path = os.path.join(output_dir, shard_filename(JOURNAL_FILENAME, shard))
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._pending: List[Tuple[str, str, Optional[str], str, Optional[str], float]] = []
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " key TEXT PRIMARY KEY, url TEXT, filename TEXT,"
+            " state TEXT, error TEXT, updated REAL)"
+        )
+        self._db.commit()
+
+        self._writer = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._writer.start()
+
+    @staticmethod
+    def exists(output_dir: str) -> bool:
+        """Whether a journal was left in output_dir by an earlier batch, sharded or not"""
+        if os.path.exists(os.path.join(output_dir, JOURNAL_FILENAME)):
+            return True
+        base, ext = os.path.splitext(JOURNAL_FILENAME)
+        try:
+            return any(
+                name.startswith(f"{base}.shard-") and name.endswith(ext) for name in os.listdir(output_dir)
+            )
+        except OSError:
+            return False
+
+    def reset(self):
+        """Forget every recorded item, used when a batch starts from scratch"""
+        with self._lock:
+            self._pending.clear()
+        with self._db_lock:
+            self._db.execute("DELETE FROM items")
+            self._db.commit()
+
+    def done_items(self) -> Dict[str, Optional[str]]:
+        """Keys of items finished in an earlier run, mapped to their filename"""
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT key, filename FROM items WHERE state = ?", (DONE,)
+            ).fetchall()
+        return dict(rows)
+
+    def record(self, key: str, item: DownloadItem, state: str):
+        """Buffer one state transition for the next flush"""
+        self.record_many([(key, item)], state)
+
+    def record_many(self, entries: Iterable[Tuple[str, DownloadItem]], state: str):
+        """Buffer the same state transition for many items"""
+        now = time.time()
+        error = None
+        with self._lock:
+            for key, item in entries:
+                if state == FAILED:
+                    error = item.error
+                self._pending.append((key, item.url, item.filename, state, error, now))
+            if len(self._pending) >= self.flush_size:
+                self._wakeup.set()
+
+    def flush(self):
+        """Write every buffered transition in a single transaction"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        with self._db_lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO items (key, url, filename, state, error, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                pending
+            )
+            self._db.commit()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def close(self):
+        """Flush what is left and close the database"""
+        self._closed = True
+        self._wakeup.set()
+        self._writer.join()
+        self.flush()
+        with self._db_lock:
+            self._db.close()
@@ -0,0 +1,303 @@
+import bisect
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from .models import DownloadStats
+from .utils import shard_filename
+
+METRICS_JSON = "download_metrics.json"
+METRICS_PROM = "download_metrics.prom"
+
+# Upper bounds in seconds, shared by every latency histogram
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+
+PHASES = ("dns", "connect", "tls", "ttfb", "transfer")
+
+@dataclass
+class RequestTimings:
+    """Phase durations of one request in seconds, None when a phase didn't happen (reused connection)"""
+    dns: Optional[float] = None
+    connect: Optional[float] = None
+    tls: Optional[float] = None
+    ttfb: Optional[float] = None
+    transfer: Optional[float] = None
+
+    @property
+    def setup(self) -> float:
+        """Time spent opening a new connection, 0 on a reused one"""
+        return (self.dns or 0) + (self.connect or 0) + (self.tls or 0)
+
+_local = threading.local()
+
+def begin_request_timings() -> RequestTimings:
+    """Start timing a request made on this thread; connection hooks fill in setup phases"""
+    _local.timings = RequestTimings()
+    return _local.timings
+
+def current_request_timings() -> Optional[RequestTimings]:
+    return getattr(_local, 'timings', None)
+
+class Histogram:
+    """Fixed-bucket latency histogram, cheap to update and to merge into reports"""
+
+    def __init__(self, buckets: List[float] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by interpolating inside its bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else lower * 2 or 1.0
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts))
+        }
+
+class HostMetrics:
+    """Everything recorded for one host"""
+
+    def __init__(self):
+        self.latency = {phase: Histogram() for phase in PHASES}
+        self.item_latency = Histogram()  # First attempt to settled, retries included
+        self.bytes = 0
+        self.transfer_seconds = 0.0
+        self.succeeded = 0
+        self.failed = 0
+        self.retries = 0
+        self.errors = 0  # Attempts that ended without an HTTP status
+        self.status_codes: Counter = Counter()
+        self.concurrency_limit: Optional[int] = None  # Adaptive mode only
+        self.concurrency_peak: Optional[int] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "items": {"succeeded": self.succeeded, "failed": self.failed},
+            "retries": self.retries,
+            "errors": self.errors,
+            "status_codes": {str(code): n for code, n in sorted(self.status_codes.items())},
+            "bytes": self.bytes,
+            "mb_per_second": round(self.bytes / self.transfer_seconds / 1024 / 1024, 3)
+            if self.transfer_seconds else None,
+            "latency": {phase: h.to_dict() for phase, h in self.latency.items()},
+            "item_latency": self.item_latency.to_dict(),
+            "concurrency_limit": self.concurrency_limit,
+            "concurrency_peak": self.concurrency_peak
+        }
+
+class DownloadMetrics:
+    """
+    Per-host latency histograms, counters and rolling throughput for a batch.
+
+    Worker threads record request phases and transfers, the dispatcher
+    records retries and outcomes. snapshot() returns a JSON-ready view at
+    any time and write() saves it as JSON and Prometheus text.
+    `connection_stats` supplies the engine's connection reuse and DNS cache
+    counters (a session.PoolStats).
+    """
+
+    def __init__(self, window: float = 10.0, connection_stats: Optional[Callable] = None):
+        self.window = window
+        self.connection_stats = connection_stats
+        self.hosts: Dict[str, HostMetrics] = {}
+        self.stats = DownloadStats()
+        self.item_latency = Histogram()
+        self._events: Deque[Tuple[float, int, int]] = deque()  # (time, items, bytes)
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _host(self, host: str) -> HostMetrics:
+        metrics = self.hosts.get(host)
+        if metrics is None:
+            metrics = self.hosts[host] = HostMetrics()
+        return metrics
+
+    def record_request(self, host: str, timings: RequestTimings, status: int):
+        """Connection setup and time to first byte of one response"""
+        with self._lock:
+            metrics = self._host(host)
+            metrics.status_codes[status] += 1
+            for phase in ("dns", "connect", "tls", "ttfb"):
+                value = getattr(timings, phase)
+                if value is not None:
+                    metrics.latency[phase].observe(value)
+
+    def record_transfer(self, host: str, seconds: float, size: int):
+        """Body download of one response"""
+        with self._lock:
+            metrics = self._host(host)
+            metrics.latency["transfer"].observe(seconds)
+            metrics.bytes += size
+            metrics.transfer_seconds += seconds
+            self._events.append((time.monotonic(), 0, size))
+
+    def record_retry(self, host: str):
+        with self._lock:
+            self._host(host).retries += 1
+
+    def record_error(self, host: str):
+        with self._lock:
+            self._host(host).errors += 1
+
+    def record_concurrency(self, host: str, limit: int):
+        """The host's adaptive concurrency limit changed"""
+        with self._lock:
+            metrics = self._host(host)
+            metrics.concurrency_limit = limit
+            metrics.concurrency_peak = max(limit, metrics.concurrency_peak or 0)
+
+    def record_item(self, host: str, succeeded: bool, seconds: Optional[float] = None):
+        """An item settled, `seconds` after its first attempt started"""
+        with self._lock:
+            metrics = self._host(host)
+            if seconds is not None:
+                metrics.item_latency.observe(seconds)
+                self.item_latency.observe(seconds)
+            if succeeded:
+                metrics.succeeded += 1
+                self.stats.increment_success()
+            else:
+                metrics.failed += 1
+                self.stats.increment_failed()
+            self._events.append((time.monotonic(), 1, 0))
+
+    def record_skipped(self, count: int = 1):
+        """Items a resumed batch didn't need to download"""
+        with self._lock:
+            for _ in range(count):
+                self.stats.increment_skipped()
+
+    def throughput(self) -> Dict[str, float]:
+        """Items/s and MB/s over the last `window` seconds and over the whole batch"""
+        with self._lock:
+            now = time.monotonic()
+            while self._events and self._events[0][0] < now - self.window:
+                self._events.popleft()
+            items = sum(event[1] for event in self._events)
+            size = sum(event[2] for event in self._events)
+            elapsed = max(now - self._started, 1e-9)
+            total_bytes = sum(m.bytes for m in self.hosts.values())
+            span = min(self.window, elapsed)
+            return {
+                "items_per_second": round(items / span, 3),
+                "mb_per_second": round(size / span / 1024 / 1024, 3),
+                "batch_items_per_second": round((self.stats.success + self.stats.failed) / elapsed, 3),
+                "batch_mb_per_second": round(total_bytes / elapsed / 1024 / 1024, 3)
+            }
+
+    def snapshot(self) -> Dict:
+        throughput = self.throughput()
+        connections = self.connection_stats().to_dict() if self.connection_stats else None
+        with self._lock:
+            return {
+                "elapsed": round(time.monotonic() - self._started, 3),
+                "items": dict(self.stats.__dict__),
+                "throughput": throughput,
+                "connections": connections,
+                "item_latency": self.item_latency.to_dict(),
+                "hosts": {host: m.to_dict() for host, m in sorted(self.hosts.items())}
+            }
+
+    def slowest_hosts(self, limit: int = 3) -> List[Tuple[str, float]]:
+        """Hosts with the highest p90 time to first byte"""
+        with self._lock:
+            ranked = [
+                (host, m.latency["ttfb"].quantile(0.9))
+                for host, m in self.hosts.items() if m.latency["ttfb"].count
+            ]
+        return sorted(ranked, key=lambda entry: entry[1], reverse=True)[:limit]
+
+    def write(self, output_dir: str, shard: Optional[int] = None) -> Tuple[str, str]:
+        """Save the snapshot as JSON and as Prometheus text exposition format, one pair per shard"""
+        snapshot = self.snapshot()
+        json_path = os.path.join(output_dir, shard_filename(METRICS_JSON, shard))
+        with open(json_path, 'w') as f:
+            json.dump(snapshot, f, indent=2)
+        prom_path = os.path.join(output_dir, shard_filename(METRICS_PROM, shard))
+        with open(prom_path, 'w') as f:
+            f.write(self._prometheus_text(snapshot))
+        return json_path, prom_path
+
+    def _prometheus_text(self, snapshot: Dict) -> str:
+        prefix = "image_downloader"
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+
+        def histogram(name, host, h):
+            cumulative = 0
+            for bound, count in zip([str(b) for b in h.buckets] + ["+Inf"], h.counts):
+                cumulative += count
+                lines.append(f'{prefix}_{name}_bucket{{host="{host}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_{name}_sum{{host="{host}"}} {h.sum:.6f}')
+            lines.append(f'{prefix}_{name}_count{{host="{host}"}} {h.count}')
+
+        with self._lock:
+            hosts = sorted(self.hosts.items())
+            for phase in PHASES:
+                metric(f"{phase}_seconds", "histogram", f"Time spent in the {phase} phase of a request")
+                for host, m in hosts:
+                    histogram(f"{phase}_seconds", host, m.latency[phase])
+            metric("item_seconds", "histogram", "Time from an item's first attempt until it settled")
+            for host, m in hosts:
+                histogram("item_seconds", host, m.item_latency)
+
+            metric("bytes_total", "counter", "Bytes downloaded")
+            lines += [f'{prefix}_bytes_total{{host="{host}"}} {m.bytes}' for host, m in hosts]
+            metric("items_total", "counter", "Items finished, by result")
+            for host, m in hosts:
+                lines.append(f'{prefix}_items_total{{host="{host}",result="succeeded"}} {m.succeeded}')
+                lines.append(f'{prefix}_items_total{{host="{host}",result="failed"}} {m.failed}')
+            metric("retries_total", "counter", "Retries scheduled")
+            lines += [f'{prefix}_retries_total{{host="{host}"}} {m.retries}' for host, m in hosts]
+            metric("errors_total", "counter", "Attempts that failed without an HTTP response")
+            lines += [f'{prefix}_errors_total{{host="{host}"}} {m.errors}' for host, m in hosts]
+            adaptive = [(host, m) for host, m in hosts if m.concurrency_limit is not None]
+            if adaptive:
+                metric("concurrency_limit", "gauge", "Current adaptive concurrency limit")
+                lines += [f'{prefix}_concurrency_limit{{host="{host}"}} {m.concurrency_limit}' for host, m in adaptive]
+            metric("responses_total", "counter", "HTTP responses, by status code")
+            for host, m in hosts:
+                for code, n in sorted(m.status_codes.items()):
+                    lines.append(f'{prefix}_responses_total{{host="{host}",code="{code}"}} {n}')
+
+        connections = snapshot["connections"]
+        if connections:
+            metric("connections_opened_total", "counter", "New connections opened")
+            lines.append(f"{prefix}_connections_opened_total {connections['connections']}")
+            metric("dns_cache_hits_total", "counter", "Host lookups answered from the DNS cache")
+            lines.append(f"{prefix}_dns_cache_hits_total {connections['dns_hits']}")
+            metric("dns_cache_misses_total", "counter", "Host lookups sent to the resolver")
+            lines.append(f"{prefix}_dns_cache_misses_total {connections['dns_misses']}")
+
+        for key, value in snapshot["throughput"].items():
+            metric(key, "gauge", key.replace("_", " ").capitalize())
+            lines.append(f"{prefix}_{key} {value}")
+        return "\n".join(lines) + "\n"
@@ -1,74 +1,113 @@
-from dataclasses import dataclass
-from typing import List, Dict, Optional
-from pathlib import Path
-import json
-
-@dataclass
-class DownloadItem:
-    """Represents a single download item with URL and optional filename"""
-    url: str
-    filename: Optional[str] = None
-    error: Optional[str] = None
-
-@dataclass
-class DownloadBatch:
-    """Represents a batch of downloads with common settings"""
-    items: List[DownloadItem]
-    output_dir: str
-    batch_size: int = 5
-
-@dataclass
-class AppConfig:
-    """Application configuration settings"""
-    download_folder: str
-    batch_size: int
-    max_retries: int
-    theme: str
-    max_file_size: int  # In MB
-    default_format: str  # 'original', 'jpeg', 'png', etc.
-    
-    @classmethod
-    def from_json(cls, json_str: str) -> 'AppConfig':
-        """Create config from JSON string"""
-        data = json.loads(json_str)
-        return cls(**data)
-    
-    def to_json(self) -> str:
-        """Serialize config to JSON string"""
-        return json.dumps(self.__dict__, indent=2)
-
-@dataclass
-class DownloadStats:
-    """Tracks download statistics"""
-    total: int = 0
-    success: int = 0
-    failed: int = 0
-    skipped: int = 0
-    
-    def increment_success(self):
-        self.success += 1
-        self.total += 1
-    
-    def increment_failed(self):
-        self.failed += 1
-        self.total += 1
-    
-    def increment_skipped(self):
-        self.skipped += 1
-        self.total += 1
-
-@dataclass 
-class ImageConversionSettings:
-    """Settings for image conversion"""
-    output_format: str = 'jpeg'
-    max_width: int = 1024
-    max_height: int = 1024
-    quality: int = 85
-    preserve_metadata: bool = False
-
-@dataclass
-class CloudServiceAuth:
-    """Authentication credentials for cloud services"""
-    dropbox_token: Optional[str] = None
-    google_drive_credentials: Optional[Dict] = None
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Tuple
+from pathlib import Path
+import copy
+import json
+from .constants import DEFAULT_HOST_LIMITS, PRIORITY_NORMAL
+
+@dataclass
+class DownloadItem:
+    """Represents a single download item with URL and optional filename"""
+    url: str
+    filename: Optional[str] = None
+    error: Optional[str] = None
+    priority: Optional[int] = None  # PRIORITY_LOW/NORMAL/HIGH, None takes the batch's
+
+@dataclass
+class DownloadBatch:
+    """Represents a batch of downloads with common settings"""
+    items: List[DownloadItem]
+    output_dir: str
+    batch_size: int = 5
+    priority: int = PRIORITY_NORMAL  # For items without their own
+
+@dataclass
+class AppConfig:
+    """Application configuration settings"""
+    download_folder: str
+    batch_size: int
+    max_retries: int
+    theme: str
+    max_file_size: int  # In MB
+    default_format: str  # 'original', 'jpeg', 'png', etc.
+    journal_enabled: bool = True  # Checkpoint item states so batches can resume
+    dedup_downloads: bool = False  # Store identical images once, hardlinked per filename
+    blob_store_dir: Optional[str] = None  # Defaults to <output_dir>/.blobs
+    revalidation_cache: bool = True  # Conditional requests for files from earlier runs
+    cache_max_entries: int = 100000
+    negative_cache: bool = True  # Fail URLs found dead by earlier runs without requesting them
+    negative_cache_max_entries: int = 100000
+    bypass_negative_cache: bool = False  # Request those URLs anyway, updating the cache with the results
+    engine_mode: str = "threads"  # 'threads' or 'asyncio'
+    async_concurrency: int = 200  # In-flight downloads in asyncio mode
+    shards: int = 1  # Processes a batch is split across, 1 runs it in the app's process
+    work_queue: Optional[str] = None  # Shared queue file, to split batches with other machines
+    adaptive_concurrency: bool = False  # Tune each host's concurrency from its responses
+    min_concurrency: int = 1  # Per-host bounds in adaptive mode
+    max_concurrency: int = 32
+    convert_max_width: int = 0  # Downscale wider images, 0 keeps the width
+    convert_max_height: int = 0  # Downscale taller images, 0 keeps the height
+    convert_quality: int = 85  # JPEG/WEBP quality when converting
+    # Per-domain {"max_concurrency": int, "rate": req/s, "burst": int}
+    host_limits: Dict[str, Dict[str, float]] = field(
+        default_factory=lambda: copy.deepcopy(DEFAULT_HOST_LIMITS)
+    )
+    
+    @classmethod
+    def from_json(cls, json_str: str) -> 'AppConfig':
+        """Create config from JSON string"""
+        data = json.loads(json_str)
+        return cls(**data)
+    
+    def to_json(self) -> str:
+        """Serialize config to JSON string"""
+        return json.dumps(self.__dict__, indent=2)
+
+@dataclass
+class DownloadStats:
+    """Tracks download statistics"""
+    total: int = 0
+    success: int = 0
+    failed: int = 0
+    skipped: int = 0
+    
+    def increment_success(self):
+        self.success += 1
+        self.total += 1
+    
+    def increment_failed(self):
+        self.failed += 1
+        self.total += 1
+    
+    def increment_skipped(self):
+        self.skipped += 1
+        self.total += 1
+
+@dataclass
+class ProgressSnapshot:
+    """Batched download progress, published to the UI a few times per second"""
+    total: int
+    completed: int = 0
+    failed: int = 0
+    bytes_downloaded: int = 0
+    current_file: str = ""
+    elapsed: float = 0.0
+    messages: List[Tuple[str, str]] = field(default_factory=list)  # (message, level), oldest first
+    dropped_messages: int = 0  # Older messages left out since the previous snapshot
+    concurrency_limits: Dict[str, int] = field(default_factory=dict)  # Adaptive limit of each busy host
+
+@dataclass 
+class ImageConversionSettings:
+    """Settings for image conversion"""
+    output_format: str = 'jpeg'
+    max_width: int = 1024
+    max_height: int = 1024
+    quality: int = 85
+    preserve_metadata: bool = False
+
+@dataclass
+class CloudServiceAuth:
+    """Authentication credentials for cloud services"""
+    dropbox_token: Optional[str] = None
+    google_drive_credentials: Optional[Dict] = None
     aws_keys: Optional[Dict] = None
\ No newline at end of file
@@ -0,0 +1,66 @@
+import os
+import threading
+from multiprocessing.managers import BaseManager
+from typing import Dict, Set
+from .resume import PART_SUFFIX
+
+class NameIndex:
+    """
+    Hands out unique output filenames from memory.
+
+    The output directory is listed once when the batch starts; after that
+    every name is reserved under a lock, so two workers can never pick the
+    same path and no filesystem probing happens per item. Collisions get
+    `name_1`, `name_2`, ... with a per-name counter, so the thousandth
+    `image.jpg` costs the same as the first.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._taken: Set[str] = set()
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._scan()
+
+    def _scan(self):
+        """Index existing files, counting a .part file as its final name"""
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                name = entry.name
+                if name.endswith(PART_SUFFIX):
+                    name = name[:-len(PART_SUFFIX)]
+                self._taken.add(os.path.normcase(name))
+
+    def reserve(self, filename: str) -> str:
+        """Claim a free path for filename, adding a counter on collision"""
+        key = os.path.normcase(filename)
+        with self._lock:
+            if key in self._taken:
+                base, ext = os.path.splitext(filename)
+                counter = self._counters.get(key, 1)
+                while os.path.normcase(f"{base}_{counter}{ext}") in self._taken:
+                    counter += 1
+                self._counters[key] = counter + 1
+                filename = f"{base}_{counter}{ext}"
+                key = os.path.normcase(filename)
+            self._taken.add(key)
+        return os.path.join(self.directory, filename)
+
+    def release(self, filepath: str):
+        """Give back a reserved name whose download failed"""
+        with self._lock:
+            self._taken.discard(os.path.normcase(os.path.basename(filepath)))
+
+class NameServer(BaseManager):
+    """
+    Process hosting one NameIndex for the shards of a batch.
+
+    Shard processes reserve and release names through a proxy, so shards
+    writing to the same directory never pick the same file:
+
+        server = NameServer(ctx=multiprocessing.get_context("spawn"))
+        server.start()
+        names = server.NameIndex(output_dir)
+    """
+
+NameServer.register("NameIndex", NameIndex)
@@ -0,0 +1,125 @@
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from .constants import NEGATIVE_CACHE_MAX_ENTRIES, NEGATIVE_CACHE_TTLS, NEGATIVE_DNS_TTL
+from .retry import error_status, is_dns_failure
+
+DNS_FAILURE = "dns"
+
+def negative_reason(error: Exception) -> Optional[Tuple[str, float]]:
+    """(reason, ttl) if an error says the URL is dead for a while, None if it's worth trying again next run"""
+    status = error_status(error)
+    if status in NEGATIVE_CACHE_TTLS:
+        return str(status), NEGATIVE_CACHE_TTLS[status]
+    if status is None and is_dns_failure(error):
+        return DNS_FAILURE, NEGATIVE_DNS_TTL
+    return None
+
+@dataclass
+class NegativeEntry:
+    """A URL that failed for good on an earlier run"""
+    url: str
+    reason: str  # HTTP status or DNS_FAILURE
+    error: str
+    expires: float
+
+    def describe(self) -> str:
+        until = time.strftime("%Y-%m-%d %H:%M", time.localtime(self.expires))
+        return f"{self.error} (remembered from an earlier run, retried after {until})"
+
+class NegativeCache:
+    """
+    Persistent cache of dead URLs keyed by normalized URL.
+
+    Remembers URLs whose last attempt ended in a 404, 410 or a host name
+    that didn't resolve, each for its own TTL, so a re-run of the same sheet
+    fails them at once instead of requesting and retrying them again.
+    Expired entries are dropped when looked up; the index is capped at
+    max_entries and evicts expired, then least recently used entries first.
+    """
+
+    def __init__(self, path: str, max_entries: int = NEGATIVE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.stored = 0
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " url TEXT PRIMARY KEY, reason TEXT, error TEXT, expires REAL, last_used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used)")
+        self._db.commit()
+
+    def lookup(self, url: str) -> Optional[NegativeEntry]:
+        """Unexpired entry for url, else None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, reason, error, expires FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            entry = NegativeEntry(*row)
+            now = time.time()
+            if entry.expires <= now:
+                self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+                entry = None
+            else:
+                self.hits += 1
+                self._db.execute("UPDATE entries SET last_used = ? WHERE url = ?", (now, url))
+            self._db.commit()
+        return entry
+
+    def store(self, url: str, error: Exception) -> bool:
+        """Remember a URL whose final attempt failed with `error`; False if the error isn't cached"""
+        reason = negative_reason(error)
+        if reason is None:
+            return False
+
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (url, reason, error, expires, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (url, reason[0], str(error) or type(error).__name__, now + reason[1], now)
+            )
+            self.stored += 1
+            self._writes += 1
+            # Amortize the eviction queries over many inserts
+            if self._writes % 1000 == 0:
+                self._evict()
+            self._db.commit()
+        return True
+
+    def forget(self, url: str):
+        with self._lock:
+            self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self._db.commit()
+
+    def _evict(self):
+        """Drop expired entries, then least recently used ones beyond max_entries"""
+        self._db.execute("DELETE FROM entries WHERE expires <= ?", (time.time(),))
+        count = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM entries WHERE url IN"
+                " (SELECT url FROM entries ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+
+    def close(self):
+        with self._lock:
+            self._evict()
+            self._db.commit()
+            self._db.close()
@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+from .constants import SNAPSHOT_INTERVAL, SNAPSHOT_MAX_MESSAGES
+from .models import ProgressSnapshot
+
+class ProgressAggregator:
+    """
+    Coalesces per-item progress and log events into periodic snapshots.
+
+    Download threads and the dispatcher report into this object, which is
+    cheap and never crosses threads. A background thread publishes a
+    ProgressSnapshot through `publish` every `interval` seconds, and only
+    when something changed, so the UI sees at most ~10 updates per second
+    however many items finish. Only the newest `max_messages` log lines
+    are kept between snapshots; the rest are counted as dropped.
+    """
+
+    def __init__(
+        self,
+        total: int,
+        publish: Callable[[ProgressSnapshot], None],
+        interval: float = SNAPSHOT_INTERVAL,
+        max_messages: int = SNAPSHOT_MAX_MESSAGES
+    ):
+        self.total = total
+        self.publish = publish
+        self.interval = interval
+        self._messages: Deque[Tuple[str, str]] = deque(maxlen=max_messages)
+        self._dropped = 0
+        self._completed = 0
+        self._failed = 0
+        self._bytes = 0
+        self._current_file = ""
+        self._concurrency: Dict[str, int] = {}
+        self._dirty = False
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="progress-snapshots", daemon=True)
+        self._thread.start()
+
+    def message(self, text: str, level: str = "info"):
+        with self._lock:
+            if len(self._messages) == self._messages.maxlen:
+                self._dropped += 1
+            self._messages.append((text, level))
+            self._dirty = True
+
+    def add_dropped(self, count: int):
+        """Messages left out upstream, e.g. by a shard's own aggregator"""
+        with self._lock:
+            self._dropped += count
+            self._dirty = True
+
+    def progress(self, completed: int, failed: int, current_file: Optional[str] = None):
+        with self._lock:
+            self._completed = completed
+            self._failed = failed
+            if current_file:
+                self._current_file = current_file
+            self._dirty = True
+
+    def add_total(self, count: int):
+        """Items added to the running batch"""
+        with self._lock:
+            self.total += count
+            self._dirty = True
+
+    def add_bytes(self, count: int):
+        with self._lock:
+            self._bytes += count
+            self._dirty = True
+
+    def concurrency(self, limits: Dict[str, int]):
+        """Adaptive concurrency limits of the hosts currently downloading"""
+        with self._lock:
+            if limits != self._concurrency:
+                self._concurrency = limits
+                self._dirty = True
+
+    def snapshot(self) -> ProgressSnapshot:
+        """Current state plus the messages logged since the previous snapshot"""
+        with self._lock:
+            snapshot = ProgressSnapshot(
+                total=self.total,
+                completed=self._completed,
+                failed=self._failed,
+                bytes_downloaded=self._bytes,
+                current_file=self._current_file,
+                elapsed=time.monotonic() - self._started,
+                messages=list(self._messages),
+                dropped_messages=self._dropped,
+                concurrency_limits=self._concurrency
+            )
+            self._messages.clear()
+            self._dropped = 0
+            self._dirty = False
+        return snapshot
+
+    def flush(self):
+        """Publish a snapshot if anything changed since the last one"""
+        if self._dirty:
+            self.publish(self.snapshot())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def close(self):
+        """Stop the publishing thread and send whatever is left"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.flush()
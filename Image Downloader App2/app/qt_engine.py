@@ -0,0 +1,36 @@
+from typing import List
+from PyQt6.QtCore import QObject, pyqtSignal
+from .downloader import DownloadCore
+from .models import DownloadItem
+
+class DownloadEngine(QObject):
+    """
+    Qt front for a DownloadCore.
+
+    Turns the core's callbacks into signals, so the engine can run on a
+    QThread and reach the GUI through queued connections. Extra keyword
+    arguments go to core_class (DownloadCore or AsyncDownloadCore).
+    """
+    snapshot = pyqtSignal(object)  # ProgressSnapshot, coalesced to a few per second
+    finished = pyqtSignal(bool)  # success
+
+    def __init__(self, *args, core_class=DownloadCore, **kwargs):
+        super().__init__()
+        self.core = core_class(
+            *args, on_snapshot=self.snapshot.emit, on_finished=self.finished.emit, **kwargs
+        )
+
+    @property
+    def failed_items(self) -> List[DownloadItem]:
+        return self.core.failed_items
+
+    def start(self):
+        """Run the batch, blocking until it finishes"""
+        self.core.start()
+
+    def cancel(self):
+        self.core.cancel()
+
+    def add_items(self, items: List[DownloadItem]) -> bool:
+        """Add items to the running batch, see DownloadCore.add_items"""
+        return self.core.add_items(items)
@@ -0,0 +1,215 @@
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from .constants import (
+    ADAPTIVE_MAX_CONCURRENCY,
+    ADAPTIVE_MIN_CONCURRENCY,
+    AIMD_BACKOFF,
+    AIMD_LATENCY_SLACK,
+    AIMD_LATENCY_TOLERANCE
+)
+
+@dataclass
+class HostLimit:
+    """Concurrency cap and request rate for one domain (None = unlimited)"""
+    max_concurrency: Optional[int] = None
+    rate: Optional[float] = None  # Requests per second
+    burst: Optional[float] = None  # Bucket capacity, defaults to rate
+
+@dataclass
+class ConcurrencyBounds:
+    """Where adaptive per-host concurrency limits start and the range they move in"""
+    initial: int
+    minimum: int = ADAPTIVE_MIN_CONCURRENCY
+    maximum: int = ADAPTIVE_MAX_CONCURRENCY
+
+class AIMDLimit:
+    """
+    Adaptive concurrency limit for one host: additive increase, multiplicative decrease.
+
+    Successful responses are grouped into rounds of `limit` completions. After
+    a round in which the host used its whole limit, the limit grows by one if
+    the smoothed time to first byte stayed within `tolerance` times the
+    host's baseline and throughput didn't drop; if latency rose past that,
+    it shrinks by one. Congestion (timeouts, 429s, 5xx) cuts it by `backoff`
+    at once, but only for requests sent after the previous cut, so one burst
+    of failures counts as one signal.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int = ADAPTIVE_MIN_CONCURRENCY,
+        maximum: int = ADAPTIVE_MAX_CONCURRENCY,
+        backoff: float = AIMD_BACKOFF,
+        tolerance: float = AIMD_LATENCY_TOLERANCE
+    ):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.latency: Optional[float] = None  # Smoothed time to first byte
+        self.baseline: Optional[float] = None  # Lowest smoothed latency, drifting up slowly
+        self.saturated = False  # All slots were in use at some point this round
+        self._throughput: Optional[float] = None  # Completions per second of the last round
+        self._round_started = time.monotonic()
+        self._round_done = 0
+        self._cut_at = float('-inf')
+
+    @property
+    def current(self) -> int:
+        return int(self.limit)
+
+    def on_success(self, latency: float, now: Optional[float] = None):
+        """A response arrived `latency` seconds after its request, without congestion"""
+        now = time.monotonic() if now is None else now
+        self.latency = latency if self.latency is None else self.latency * 0.8 + latency * 0.2
+        self._round_done += 1
+        if self._round_done < self.current:
+            return
+
+        throughput = self._round_done / max(now - self._round_started, 1e-6)
+        # Creeping up lets the baseline follow a host that got slower for good
+        self.baseline = self.latency if self.baseline is None else min(self.latency, self.baseline * 1.05)
+        if self.latency > self.baseline * self.tolerance + AIMD_LATENCY_SLACK:
+            self.limit = max(self.minimum, self.limit - 1)
+        elif self.saturated and (self._throughput is None or throughput >= self._throughput * 0.9):
+            self.limit = min(self.maximum, self.limit + 1)
+        self._start_round(now, throughput)
+
+    def on_congestion(self, sent: float, now: Optional[float] = None) -> bool:
+        """A request sent at `sent` hit congestion; returns True if the limit was cut"""
+        if sent < self._cut_at:
+            # Already in flight at the last cut, which accounted for it
+            return False
+        now = time.monotonic() if now is None else now
+        self.limit = max(float(self.minimum), self.limit * self.backoff)
+        self._cut_at = now
+        self._start_round(now, None)
+        return True
+
+    def _start_round(self, now: float, throughput: Optional[float]):
+        self._round_started = now
+        self._round_done = 0
+        self._throughput = throughput
+        self.saturated = False
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate` tokens per second"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = max(1.0, burst if burst is not None else rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, now: Optional[float] = None) -> float:
+        """Take one token; return 0 on success or the seconds until one is available"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class HostLimiter:
+    """
+    Resolves per-domain limits and tracks each host's in-flight count and bucket.
+
+    Limits are configured by domain; a host matches a domain when it is the
+    domain itself or any subdomain of it (www.dropbox.com -> dropbox.com).
+    Hosts without a configured domain are unlimited.
+
+    With `adaptive` bounds every host gets an AIMDLimit as its concurrency
+    cap instead, never above the domain's configured max_concurrency.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Dict[str, float]]] = None,
+        adaptive: Optional[ConcurrencyBounds] = None
+    ):
+        self.limits = {
+            domain.lower(): HostLimit(**settings)
+            for domain, settings in (limits or {}).items()
+        }
+        self.adaptive = adaptive
+        self.active: Dict[str, int] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._resolved: Dict[str, HostLimit] = {}
+        self._adaptive: Dict[str, AIMDLimit] = {}
+
+    def limit_for(self, host: str) -> HostLimit:
+        """Find the most specific configured limit for a host"""
+        limit = self._resolved.get(host)
+        if limit is None:
+            limit = HostLimit()
+            parts = host.split('.')
+            for i in range(len(parts)):
+                domain = '.'.join(parts[i:])
+                if domain in self.limits:
+                    limit = self.limits[domain]
+                    break
+            self._resolved[host] = limit
+        return limit
+
+    def adaptive_limit(self, host: str) -> Optional[AIMDLimit]:
+        """The host's AIMD limit, None when concurrency isn't adaptive"""
+        if self.adaptive is None:
+            return None
+        aimd = self._adaptive.get(host)
+        if aimd is None:
+            maximum = self.adaptive.maximum
+            configured = self.limit_for(host).max_concurrency
+            if configured is not None:
+                maximum = min(maximum, configured)
+            aimd = self._adaptive[host] = AIMDLimit(self.adaptive.initial, self.adaptive.minimum, maximum)
+        return aimd
+
+    def active_limits(self) -> Dict[str, int]:
+        """Current adaptive limit of each host with a request in flight"""
+        return {
+            host: self._adaptive[host].current
+            for host, active in self.active.items() if active and host in self._adaptive
+        }
+
+    def try_acquire(self, host: str, now: Optional[float] = None) -> Optional[float]:
+        """
+        Reserve a slot for one request to host.
+
+        Returns 0 when the slot was granted, the seconds until a token frees
+        up when the host is rate limited, or None when it is at its
+        concurrency cap (a slot frees up when a running download finishes).
+        """
+        limit = self.limit_for(host)
+        active = self.active.get(host, 0)
+        cap = limit.max_concurrency
+        aimd = self.adaptive_limit(host)
+        if aimd is not None:
+            cap = aimd.current
+        if cap is not None and active >= cap:
+            if aimd is not None:
+                aimd.saturated = True
+            return None
+
+        if limit.rate:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(limit.rate, limit.burst)
+            wait = bucket.try_acquire(now)
+            if wait > 0:
+                return wait
+
+        self.active[host] = active + 1
+        if aimd is not None and active + 1 >= cap:
+            aimd.saturated = True
+        return 0.0
+
+    def release(self, host: str):
+        """Give back the concurrency slot taken by try_acquire"""
+        self.active[host] = max(0, self.active.get(host, 0) - 1)
@@ -0,0 +1,80 @@
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional
+
+PART_SUFFIX = ".part"
+
+_CONTENT_RANGE = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+|\*)')
+
+def part_path(filepath: str) -> str:
+    """Path of the in-progress file that is renamed to filepath on completion"""
+    return filepath + PART_SUFFIX
+
+@dataclass
+class ResumeState:
+    """Validators from the first response, used to resume a .part file safely"""
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    length: Optional[int] = None
+    accept_ranges: bool = False
+
+    @classmethod
+    def from_headers(cls, headers: Mapping[str, str]) -> 'ResumeState':
+        length = headers.get('content-length')
+        # A compressed body is decoded on the way to disk, so its length
+        # and byte ranges don't describe the file being written
+        encoded = headers.get('content-encoding', '').strip().lower() not in ('', 'identity')
+        return cls(
+            etag=headers.get('etag'),
+            last_modified=headers.get('last-modified'),
+            length=int(length) if length and length.isdigit() and not encoded else None,
+            accept_ranges=headers.get('accept-ranges', '').lower() == 'bytes' and not encoded
+        )
+
+    @property
+    def validator(self) -> Optional[str]:
+        """If-Range value; weak ETags are not allowed there, fall back to the date"""
+        if self.etag and not self.etag.startswith('W/'):
+            return self.etag
+        return self.last_modified
+
+    def can_resume(self) -> bool:
+        """Only resume when the server takes ranges and the file can be identified"""
+        return self.accept_ranges and bool(self.validator or self.length)
+
+    def resume_offset(self, path: str) -> int:
+        """Bytes already on disk for path, or 0 if it cannot be resumed"""
+        if not self.can_resume() or not os.path.exists(path):
+            return 0
+        size = os.path.getsize(path)
+        if self.length is not None and size >= self.length:
+            return 0
+        return size
+
+    def request_headers(self, offset: int) -> Dict[str, str]:
+        """Range headers asking for the rest of the file from offset"""
+        headers = {'Range': f'bytes={offset}-'}
+        if self.validator:
+            # Server sends the full file instead of a range if it changed
+            headers['If-Range'] = self.validator
+        return headers
+
+    def accepts(self, status: int, headers: Mapping[str, str], offset: int) -> bool:
+        """Check a response continues exactly the same file at offset"""
+        if status != 206:
+            return False
+
+        match = _CONTENT_RANGE.match(headers.get('content-range', ''))
+        if not match or int(match.group(1)) != offset:
+            return False
+
+        total = match.group(3)
+        if self.length is not None and total != '*' and int(total) != self.length:
+            return False
+
+        etag = headers.get('etag')
+        if self.etag and etag and etag != self.etag:
+            return False
+
+        return True
@@ -0,0 +1,162 @@
+import random
+import socket
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Sequence
+from .constants import BREAKER_COOLDOWN, BREAKER_THRESHOLD, MAX_RETRY_AFTER
+
+def error_status(error: Exception) -> Optional[int]:
+    """HTTP status behind a requests or aiohttp error, None for network errors"""
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status is None:
+        status = getattr(error, 'status', None)
+    return status if isinstance(status, int) else None
+
+def is_dns_failure(error: BaseException) -> bool:
+    """Whether a requests or aiohttp error comes from a host name that didn't resolve"""
+    seen = set()
+    pending = [error]
+    while pending:
+        error = pending.pop()
+        if not isinstance(error, BaseException) or id(error) in seen:
+            continue
+        seen.add(id(error))
+        if isinstance(error, socket.gaierror) or type(error).__name__ in (
+            'NameResolutionError', 'ClientConnectorDNSError'
+        ):
+            return True
+        # requests and urllib3 wrap the resolver error a few levels deep
+        pending.extend((error.__cause__, error.__context__, getattr(error, 'reason', None)))
+        pending.extend(error.args)
+    return False
+
+def error_retry_after(error: Exception) -> Optional[float]:
+    """Seconds requested by a Retry-After header on the failed response"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or getattr(error, 'headers', None)
+    value = headers.get('Retry-After') if headers else None
+    return parse_retry_after(value)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse Retry-After given either as delta-seconds or as an HTTP date"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def is_transient(error: Exception) -> bool:
+    """Whether an error is worth retrying and says the host, not the URL, is in trouble"""
+    status = error_status(error)
+    return status is None or status in (408, 429) or status >= 500
+
+class RetryPolicy:
+    """
+    Backoff delays with full jitter.
+
+    Attempt n waits a random time between 0 and delays[n] (the last delay
+    repeats), so a wave of failures doesn't retry in lockstep. A server's
+    Retry-After is treated as the minimum wait.
+    """
+
+    def __init__(self, delays: Sequence[float], max_delay: float = MAX_RETRY_AFTER):
+        self.delays = list(delays) or [1]
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        cap = self.delays[min(attempt, len(self.delays) - 1)]
+        delay = random.uniform(0, cap)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return min(delay, self.max_delay)
+
+class CircuitBreaker:
+    """
+    Stops requests to a host after repeated failures.
+
+    After `threshold` consecutive host failures the circuit opens for
+    `cooldown` seconds. Then a single probe request is let through: success
+    closes the circuit, failure reopens it with the cooldown doubled. After
+    `max_trips` openings in a row the host is given up on, so a dead host's
+    items fail fast instead of stalling the batch.
+    """
+
+    def __init__(
+        self,
+        threshold: int = BREAKER_THRESHOLD,
+        cooldown: float = BREAKER_COOLDOWN,
+        max_cooldown: float = 300.0,
+        max_trips: int = 4
+    ):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_trips = max_trips
+        self.trips = 0
+        self.failures = 0
+        self.open_until: Optional[float] = None
+        self.probing = False
+
+    def wait_time(self, now: float) -> Optional[float]:
+        """0 if a request may go out, seconds until the cooldown ends, or None while a probe runs"""
+        if self.open_until is None or self.given_up:
+            return 0.0
+        if now < self.open_until:
+            return self.open_until - now
+        return None if self.probing else 0.0
+
+    @property
+    def given_up(self) -> bool:
+        return self.trips >= self.max_trips
+
+    def on_dispatch(self):
+        """Note a request going out; the first one after a cooldown is the probe"""
+        if self.open_until is not None:
+            self.probing = True
+
+    def release_probe(self):
+        """Forget a probe that ended without a request, so another one may go out"""
+        self.probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self.trips = 0
+        self.open_until = None
+        self.probing = False
+        self.cooldown = self.base_cooldown
+
+    def record_failure(self, now: float) -> bool:
+        """Count a host failure; returns True if this opened the circuit"""
+        self.failures += 1
+        if self.probing:
+            self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+        elif self.open_until is not None or self.failures < self.threshold:
+            return False
+        self.probing = False
+        self.open_until = now + self.cooldown
+        self.trips += 1
+        return True
+
+class HostBreakers:
+    """One CircuitBreaker per host, created on first use"""
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(self.threshold, self.cooldown)
+        return breaker
+
+    def open_hosts(self) -> List[str]:
+        now = time.monotonic()
+        return [host for host, b in self._breakers.items() if b.wait_time(now) != 0]
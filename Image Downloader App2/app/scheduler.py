@@ -0,0 +1,258 @@
+import heapq
+import itertools
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+from .constants import (
+    HOST_AFFINITY,
+    PRIORITY_HIGH,
+    PRIORITY_LOW,
+    PRIORITY_NORMAL,
+    PRIORITY_WEIGHTS
+)
+from .models import DownloadItem
+from .ratelimit import HostLimiter
+from .retry import HostBreakers
+from .utils import get_host
+
+_EXHAUSTED = object()
+
+def priority_lane(priority: Optional[int], default: int = PRIORITY_NORMAL) -> int:
+    """The lane an item priority maps to, None meaning `default`"""
+    if priority is None:
+        priority = default
+    return min(max(priority, PRIORITY_LOW), PRIORITY_HIGH)
+
+@dataclass
+class Lane:
+    """Queued items of one priority, per host, and the lane's share of dispatches"""
+    priority: int
+    weight: int
+    source: Optional[Iterator[DownloadItem]] = None
+    queues: "OrderedDict[str, Deque[DownloadItem]]" = field(default_factory=OrderedDict)
+    pending: int = 0
+    # Virtual time: grows by 1/weight per dispatch, the lane furthest behind goes next
+    passed: float = 0.0
+
+class HostScheduler:
+    """
+    Hands out queued items host by host under each host's limits.
+
+    Items are queued per priority lane and host, and hosts are visited
+    round-robin, so when one host is at its concurrency cap or out of
+    tokens the next ready item for another host is dispatched instead of a
+    worker blocking on the throttled one.
+
+    Lanes share the workers by weight (PRIORITY_WEIGHTS, stride
+    scheduling): while several lanes have ready items, each dispatch goes
+    to the lane that is furthest behind its share, so high priority items
+    overtake a large normal backlog without starving it, and a lane whose
+    hosts are all throttled doesn't hold the others up. A lane that was
+    empty rejoins at the current virtual time instead of catching up on
+    turns it didn't need.
+
+    Items are pulled lazily from each lane's source in `sources` so only
+    about `window` of them are buffered per lane at a time, however large
+    the batch. If every buffered host is throttled, the buffer may grow up
+    to `max_window` looking for an item from another host. A source may
+    yield None for "nothing yet, ask again later" (a shared work queue
+    whose rest is leased by other workers); it is done when it stops.
+
+    Failed items waiting out a retry backoff sit in a heap of due times
+    rather than occupying a worker, and hosts whose circuit breaker is open
+    are skipped until their cooldown ends.
+
+    A host whose download just finished has an idle keep-alive connection,
+    so its next queued item is sent before the rotation continues, up to
+    `affinity` times in a row while other hosts are waiting.
+    """
+
+    def __init__(
+        self,
+        limiter: HostLimiter,
+        sources: Optional[Dict[int, Iterator[DownloadItem]]] = None,
+        window: int = 20,
+        max_window: Optional[int] = None,
+        breakers: Optional[HostBreakers] = None,
+        affinity: int = HOST_AFFINITY,
+        default_priority: int = PRIORITY_NORMAL
+    ):
+        self.limiter = limiter
+        self.affinity = max(1, affinity)
+        self.breakers = breakers
+        self.window = max(1, window)
+        self.max_window = max(self.window, max_window or self.window * 8)
+        self.default_priority = default_priority
+        self._lanes: Dict[int, Lane] = {}
+        for priority, source in (sources or {}).items():
+            self._lane(priority).source = source
+        self._hosts: Dict[int, str] = {}
+        self.pending = 0
+        self._delayed: List[Tuple[float, int, DownloadItem]] = []
+        self._sequence = itertools.count()
+        self._clock = 0.0  # Virtual time of the last dispatch
+        # Hosts that freed a slot since the last dispatch, oldest first
+        self._warm: "OrderedDict[str, None]" = OrderedDict()
+        self._streaks: Dict[str, int] = {}
+
+    @property
+    def has_work(self) -> bool:
+        """Whether items are buffered, waiting to be retried, or a source may yield more"""
+        return self.pending > 0 or bool(self._delayed) or self._has_source
+
+    @property
+    def _has_source(self) -> bool:
+        return any(lane.source is not None for lane in self._lanes.values())
+
+    def _lane(self, priority: int) -> Lane:
+        lane = self._lanes.get(priority)
+        if lane is None:
+            lane = self._lanes[priority] = Lane(priority, PRIORITY_WEIGHTS[priority])
+        return lane
+
+    def add(self, item: DownloadItem):
+        """Queue an item in its priority lane, behind others for the same host"""
+        host = get_host(item.url)
+        self._hosts[id(item)] = host
+        lane = self._lane(priority_lane(item.priority, self.default_priority))
+        if not lane.pending:
+            # No credit for the time the lane sat empty
+            lane.passed = max(lane.passed, self._clock)
+        queue = lane.queues.get(host)
+        if queue is None:
+            queue = lane.queues[host] = deque()
+        queue.append(item)
+        lane.pending += 1
+        self.pending += 1
+
+    def defer(self, item: DownloadItem, delay: float):
+        """Queue an item again once `delay` seconds have passed"""
+        heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._sequence), item))
+
+    def _promote_due(self, now: float) -> Optional[float]:
+        """Queue deferred items whose time has come; returns seconds until the next one"""
+        while self._delayed and self._delayed[0][0] <= now:
+            self.add(heapq.heappop(self._delayed)[2])
+        return self._delayed[0][0] - now if self._delayed else None
+
+    def _fill(self, size: int):
+        """Pull from each lane's source until `size` items are buffered in it or it runs dry"""
+        for lane in self._lanes.values():
+            while lane.source is not None and lane.pending < size:
+                item = next(lane.source, _EXHAUSTED)
+                if item is _EXHAUSTED:
+                    lane.source = None
+                elif item is None:
+                    break
+                else:
+                    self.add(item)
+
+    def acquire(self) -> Tuple[Optional[DownloadItem], Optional[float]]:
+        """
+        Take the next item whose host has capacity.
+
+        Returns (item, 0) on success. Otherwise returns (None, wait) where
+        wait is the seconds until a rate-limited host gets a token or a
+        deferred retry falls due, or None if every queued host is waiting on
+        a running download.
+        """
+        now = time.monotonic()
+        due_wait = self._promote_due(now)
+        size = self.window
+        self._fill(size)
+        item, wait = self._next_ready(now)
+
+        # Look further ahead for an unthrottled host before giving up
+        while item is None and self._has_source and size < self.max_window:
+            size = min(self.max_window, size + self.window)
+            self._fill(size)
+            item, more_wait = self._next_ready(now)
+            if more_wait is not None:
+                wait = more_wait if wait is None else min(wait, more_wait)
+
+        if item is not None:
+            return item, 0.0
+        if due_wait is not None:
+            wait = due_wait if wait is None else min(wait, due_wait)
+        return None, wait
+
+    def _next_ready(self, now: float) -> Tuple[Optional[DownloadItem], Optional[float]]:
+        # Furthest behind its share first, ties to the higher priority
+        lanes = sorted(
+            (lane for lane in self._lanes.values() if lane.pending),
+            key=lambda lane: (lane.passed, -lane.priority)
+        )
+        wait = None
+        for lane in lanes:
+            item, lane_wait = self._next_in_lane(lane, now)
+            if item is not None:
+                self._clock = lane.passed
+                lane.passed += 1 / lane.weight
+                return item, 0.0
+            if lane_wait is not None:
+                wait = lane_wait if wait is None else min(wait, lane_wait)
+        return None, wait
+
+    def _next_in_lane(self, lane: Lane, now: float) -> Tuple[Optional[DownloadItem], Optional[float]]:
+        # Reuse a connection that just went idle while it is still warm
+        for host in list(self._warm):
+            if host not in lane.queues:
+                if not self._is_queued(host):
+                    del self._warm[host]
+                continue
+            del self._warm[host]
+            if self._streaks.get(host, 0) >= self.affinity and len(lane.queues) > 1:
+                # Had its run, the rotation decides who goes next
+                continue
+            item, _ = self._try_host(lane, host, now)
+            if item is not None:
+                self._streaks[host] = self._streaks.get(host, 0) + 1
+                return item, 0.0
+
+        wait = None
+        for _ in range(len(lane.queues)):
+            host = next(iter(lane.queues))
+            # Rotate so the next call starts at the following host
+            lane.queues.move_to_end(host)
+            item, host_wait = self._try_host(lane, host, now)
+            if item is not None:
+                self._streaks.pop(host, None)
+                return item, 0.0
+            if host_wait is not None:
+                wait = host_wait if wait is None else min(wait, host_wait)
+
+        return None, wait
+
+    def _is_queued(self, host: str) -> bool:
+        return any(host in lane.queues for lane in self._lanes.values())
+
+    def _try_host(self, lane: Lane, host: str, now: float) -> Tuple[Optional[DownloadItem], Optional[float]]:
+        """Take the host's next item in the lane if its breaker and limits allow, else the wait like HostLimiter"""
+        # A paused host's items stay queued until its breaker lets a probe through
+        breaker = self.breakers.get(host) if self.breakers else None
+        host_wait = breaker.wait_time(now) if breaker else 0.0
+        if host_wait == 0:
+            host_wait = self.limiter.try_acquire(host)
+        if host_wait != 0:
+            return None, host_wait
+
+        if breaker:
+            breaker.on_dispatch()
+        queue = lane.queues[host]
+        item = queue.popleft()
+        if not queue:
+            del lane.queues[host]
+            if not self._is_queued(host):
+                self._streaks.pop(host, None)
+        lane.pending -= 1
+        self.pending -= 1
+        return item, 0.0
+
+    def release(self, item: DownloadItem):
+        """Free the host slot held by a finished item"""
+        host = self._hosts.pop(id(item))
+        self.limiter.release(host)
+        if self._is_queued(host):
+            self._warm[host] = None
+            self._warm.move_to_end(host)
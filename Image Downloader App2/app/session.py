@@ -0,0 +1,192 @@
+import functools
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from .dnscache import DNSCache
+from .metrics import current_request_timings
+
+@dataclass
+class PoolStats:
+    """Connection reuse and DNS cache counters across all host pools"""
+    requests: int = 0
+    connections: int = 0
+    dns_hits: int = 0
+    dns_misses: int = 0
+
+    @property
+    def handshakes_avoided(self) -> int:
+        return max(0, self.requests - self.connections)
+
+    @property
+    def reuse_ratio(self) -> float:
+        if not self.requests:
+            return 0.0
+        return self.handshakes_avoided / self.requests
+
+    @property
+    def dns_hit_rate(self) -> float:
+        lookups = self.dns_hits + self.dns_misses
+        return self.dns_hits / lookups if lookups else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "connections": self.connections,
+            "reuse_ratio": round(self.reuse_ratio, 4),
+            "dns_hits": self.dns_hits,
+            "dns_misses": self.dns_misses,
+            "dns_hit_rate": round(self.dns_hit_rate, 4)
+        }
+
+class TimedHTTPConnection(HTTPConnection):
+    """
+    Connection that resolves through a shared DNSCache and reports DNS and
+    TCP connect time to the thread's RequestTimings.
+    """
+
+    def __init__(self, *args, dns_cache: Optional[DNSCache] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dns_cache = dns_cache
+
+    def _new_conn(self) -> socket.socket:
+        if self.dns_cache is None:
+            return super()._new_conn()
+
+        started = time.perf_counter()
+        try:
+            addresses = self.dns_cache.resolve(self._dns_host, self.port)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        resolved = time.perf_counter()
+
+        # Connect to the cached addresses in order instead of resolving again
+        dns_host = self._dns_host
+        error = None
+        try:
+            for address in addresses:
+                self._dns_host = address[4][0]
+                try:
+                    sock = super()._new_conn()
+                    break
+                except (NewConnectionError, ConnectTimeoutError) as e:
+                    error = e
+            else:
+                raise error
+        finally:
+            self._dns_host = dns_host
+
+        timings = current_request_timings()
+        if timings is not None:
+            timings.dns = resolved - started
+            timings.connect = time.perf_counter() - resolved
+        return sock
+
+class TimedHTTPSConnection(TimedHTTPConnection, HTTPSConnection):
+    """HTTPS variant that also reports the TLS handshake time"""
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        timings = current_request_timings()
+        if timings is not None and timings.connect is not None:
+            timings.tls = max(0.0, time.perf_counter() - started - timings.dns - timings.connect)
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools open timed connections resolved through `dns_cache`"""
+
+    def __init__(self, *args, dns_cache: Optional[DNSCache] = None, **kwargs):
+        self.dns_cache = dns_cache
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        # Pools pass unknown keyword arguments on to their connections
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': functools.partial(TimedHTTPConnectionPool, dns_cache=self.dns_cache),
+            'https': functools.partial(TimedHTTPSConnectionPool, dns_cache=self.dns_cache)
+        }
+
+class HostSessionPool:
+    """
+    Keep-alive HTTP sessions keyed by host.
+
+    Each host gets its own requests.Session whose connection pool is sized
+    from the engine's worker count, so consecutive downloads from the same
+    CDN reuse the TCP+TLS connection instead of handshaking per file.
+    New connections resolve their host through one DNSCache shared by all
+    sessions and report their DNS, connect and TLS time to the requesting
+    thread's RequestTimings.
+    """
+    # Redirect targets (e.g. dropbox.com -> dl.dropboxusercontent.com) get
+    # their own pool inside the originating host's session
+    POOLS_PER_SESSION = 10
+
+    def __init__(self, pool_size: int = 5):
+        self.pool_size = max(1, pool_size)
+        self._sessions: Dict[str, requests.Session] = {}
+        self.dns_cache = DNSCache()
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> requests.Session:
+        """Return the session for the URL's host, creating it on first use"""
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._create_session()
+                self._sessions[host] = session
+            return session
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = TimedHTTPAdapter(
+            pool_connections=self.POOLS_PER_SESSION,
+            pool_maxsize=self.pool_size,
+            dns_cache=self.dns_cache
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def stats(self) -> PoolStats:
+        """Sum request and connection counts over every open pool"""
+        stats = PoolStats()
+        with self._lock:
+            sessions = list(self._sessions.values())
+
+        for session in sessions:
+            # http:// and https:// share one adapter, count it once
+            adapters = {id(a): a for a in session.adapters.values()}
+            for adapter in adapters.values():
+                pools = adapter.poolmanager.pools
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    stats.requests += pool.num_requests
+                    stats.connections += pool.num_connections
+        stats.dns_hits = self.dns_cache.hits
+        stats.dns_misses = self.dns_cache.misses
+        return stats
+
+    def close(self):
+        """Close every session and its pooled connections"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
@@ -0,0 +1,343 @@
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+from .models import DownloadItem, ProgressSnapshot
+from .names import NameServer
+from .progress import ProgressAggregator
+from .utils import normalize_url
+
+# spawn everywhere, so shards start from a clean interpreter on every
+# platform instead of forking a process that runs Qt and worker threads
+_context = multiprocessing.get_context("spawn")
+
+def shard_of(item: DownloadItem, shards: int) -> int:
+    """Shard an item runs in; repeats of a URL land together so URL dedup keeps working"""
+    return zlib.crc32(normalize_url(item.url).encode()) % shards
+
+def split_host_limits(limits: Dict[str, Dict[str, float]], shards: int) -> Dict[str, Dict[str, float]]:
+    """Each shard's part of the per-host limits, so together the shards stay within them (at least one slot each)"""
+    parts = {}
+    for host, limit in limits.items():
+        part = dict(limit)
+        for key in ("max_concurrency", "burst"):
+            if key in part:
+                part[key] = max(1, int(part[key]) // shards)
+        if part.get("rate"):
+            part["rate"] = part["rate"] / shards
+        parts[host] = part
+    return parts
+
+def _ignore_interrupt():
+    # Ctrl+C reaches the whole process group; only the parent decides to cancel
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def run_shard(
+    shard: int,
+    engine: str,
+    entries: List[Tuple[int, DownloadItem]],
+    options: Dict,
+    names,
+    commands,
+    events
+):
+    """
+    Shard process entry point: run a DownloadCore over `entries`.
+
+    Snapshots go back through `events` as they are published, followed by
+    one ("finished", shard, result) carrying each item's outcome by its
+    index in the whole batch. `commands` delivers ("cancel", None) and
+    ("add", entries) from the parent; None ends the listener.
+    """
+    _ignore_interrupt()
+    from .downloader import DownloadCore
+
+    kwargs = dict(
+        options,
+        items=[item for _, item in entries],
+        shard=shard,
+        names=names,
+        on_snapshot=lambda snapshot: events.put(("snapshot", shard, snapshot))
+    )
+    if engine == "asyncio":
+        from .async_downloader import AsyncDownloadCore
+        core = AsyncDownloadCore(**kwargs)
+    else:
+        kwargs.pop("concurrency", None)
+        core = DownloadCore(**kwargs)
+    indices = [index for index, _ in entries]
+
+    def listen():
+        while True:
+            command = commands.get()
+            if command is None:
+                return
+            name, payload = command
+            if name == "cancel":
+                core.cancel()
+            elif core.add_items([item for _, item in payload]):
+                indices.extend(index for index, _ in payload)
+            else:
+                # This shard already finished, the parent sends them elsewhere
+                events.put(("rejected", shard, payload))
+    threading.Thread(target=listen, name="shard-commands", daemon=True).start()
+
+    outcome = {}
+    core.on_finished = lambda success: outcome.update(success=success)
+    core.start()
+
+    positions = {id(item): position for position, item in enumerate(core.items)}
+    events.put(("finished", shard, {
+        "success": outcome.get("success", False),
+        "completed": core.completed,
+        "items": [(indices[position], item.filename, item.error) for position, item in enumerate(core.items)],
+        "failed": [indices[positions[id(item)]] for item in core.failed_items]
+    }))
+
+class ShardedDownloadCore:
+    """
+    Runs one batch as `shards` download processes.
+
+    For batches where per-item CPU work (hashing, validation, conversion
+    bookkeeping) keeps a single process's GIL busy before the link is
+    full. Items are split by URL hash, and each shard process runs its own
+    DownloadCore (or AsyncDownloadCore with engine="asyncio") with its own
+    worker pool, sessions and scheduler. The remaining keyword arguments
+    go to every shard; batch_size is per shard, while per-host limits and
+    conversion processes are divided between the shards.
+
+    Filenames come from one NameIndex hosted by a NameServer process, so
+    shards writing to the same directory never collide. Each shard keeps
+    its own journal and metrics files (name.shard-N.ext); resuming needs
+    the same shard count, otherwise items are simply downloaded again.
+
+    Not available with a work queue (queue_path): more workers on the
+    queue spread the load the same way.
+
+    Shard snapshots are merged into this object's own ProgressAggregator,
+    so on_snapshot and on_finished behave exactly like DownloadCore's and
+    qt_engine.DownloadEngine can wrap either.
+    """
+
+    def __init__(
+        self,
+        items: List[DownloadItem],
+        output_dir: str,
+        shards: int = 0,
+        engine: str = "threads",
+        host_limits: Optional[Dict[str, Dict[str, float]]] = None,
+        conversion_workers: Optional[int] = None,
+        on_snapshot: Optional[Callable[[ProgressSnapshot], None]] = None,
+        on_finished: Optional[Callable[[bool], None]] = None,
+        **options
+    ):
+        from .constants import DEFAULT_HOST_LIMITS
+
+        if options.get("queue_path"):
+            # Shards report outcomes by their position in this batch, which
+            # leased items from a shared queue don't have
+            raise ValueError("Sharded mode can't use a work queue, run more workers on the queue instead")
+        self.items = items
+        self.output_dir = output_dir
+        self.shards = max(1, shards or os.cpu_count() or 1)
+        self.engine = engine
+        cpus = os.cpu_count() or 1
+        self.options = dict(
+            options,
+            output_dir=output_dir,
+            host_limits=split_host_limits(DEFAULT_HOST_LIMITS if host_limits is None else host_limits, self.shards),
+            conversion_workers=conversion_workers or max(1, cpus // self.shards)
+        )
+        self.completed = 0
+        self.failed_items: List[DownloadItem] = []
+        self.on_snapshot = on_snapshot or (lambda snapshot: None)
+        self.on_finished = on_finished or (lambda success: None)
+        self.events = ProgressAggregator(len(items), lambda snapshot: self.on_snapshot(snapshot))
+        self._cancel = False
+        self._lock = threading.Lock()
+        self._commands: List = []
+        self._running: List[int] = []
+        # Latest (completed, failed, bytes, concurrency limits) reported by each shard
+        self._reported: Dict[int, Tuple[int, int, int, Dict[str, int]]] = {}
+
+    def start(self):
+        """Start the shard processes and block until every one has finished"""
+        self.events.start()
+        success = False
+        server = NameServer(ctx=_context)
+        processes = []
+        names = None
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            server.start(_ignore_interrupt)
+            names = server.NameIndex(self.output_dir)
+
+            groups: List[List[Tuple[int, DownloadItem]]] = [[] for _ in range(self.shards)]
+            for index, item in enumerate(self.items):
+                groups[shard_of(item, self.shards)].append((index, item))
+
+            events = _context.Queue()
+            with self._lock:
+                self._commands = [_context.Queue() for _ in range(self.shards)]
+                for shard, entries in enumerate(groups):
+                    process = _context.Process(
+                        target=run_shard,
+                        args=(shard, self.engine, entries, self.options, names, self._commands[shard], events),
+                        name=f"download-shard-{shard}"
+                    )
+                    process.start()
+                    processes.append(process)
+                    self._running.append(shard)
+                    if self._cancel:
+                        self._commands[shard].put(("cancel", None))
+            self._log(
+                f"Running batch in {self.shards} shard processes "
+                f"({', '.join(str(len(entries)) for entries in groups)} items)",
+                "info"
+            )
+
+            success = self._collect(events, processes)
+            self._log(
+                f"Batch finished: {self.completed}/{len(self.items)} downloaded, "
+                f"{len(self.failed_items)} failed",
+                "info"
+            )
+        except Exception as e:
+            self._log(f"Download failed: {str(e)}", "error")
+            success = False
+        finally:
+            with self._lock:
+                self._running = []
+                for commands in self._commands:
+                    commands.put(None)
+            for process in processes:
+                process.join()
+            if names is not None:
+                server.shutdown()
+            # The final snapshot goes out before finished
+            self.events.close()
+        self.on_finished(success)
+
+    def cancel(self):
+        """Cancel every shard, each stops within its own cancel grace period"""
+        with self._lock:
+            if self._cancel:
+                return
+            self._cancel = True
+            for shard in self._running:
+                self._commands[shard].put(("cancel", None))
+        self._log("Cancelling download...", "info")
+
+    def add_items(self, items: List[DownloadItem]) -> bool:
+        """Add items to the running batch from any thread, see DownloadCore.add_items"""
+        with self._lock:
+            if self._cancel or not self._running:
+                return False
+            entries = []
+            for item in items:
+                entries.append((len(self.items), item))
+                self.items.append(item)
+            self._route(entries)
+        self.events.add_total(len(items))
+        return True
+
+    def _route(self, entries: List[Tuple[int, DownloadItem]]):
+        """Send added items to their shard, or to another one still running if it finished"""
+        groups: Dict[int, List[Tuple[int, DownloadItem]]] = {}
+        for index, item in entries:
+            shard = shard_of(item, self.shards)
+            if shard not in self._running:
+                shard = self._running[index % len(self._running)]
+            groups.setdefault(shard, []).append((index, item))
+        for shard, group in groups.items():
+            self._commands[shard].put(("add", group))
+
+    def _log(self, message: str, level: str = "info"):
+        self.events.message(message, level)
+
+    def _collect(self, events, processes: List) -> bool:
+        """Merge shard events until every shard has reported its result"""
+        results: Dict[int, Dict] = {}
+        while len(results) < self.shards:
+            try:
+                kind, shard, payload = events.get(timeout=1)
+            except queue.Empty:
+                for shard, process in enumerate(processes):
+                    if shard not in results and not process.is_alive():
+                        results[shard] = self._lost(shard, process.exitcode)
+                continue
+
+            if kind == "snapshot":
+                self._merge(shard, payload)
+            elif kind == "rejected":
+                self._reroute(shard, payload)
+            else:
+                results[shard] = payload
+                self._finish_shard(shard, payload)
+        return all(result["success"] for result in results.values()) and not self.failed_items
+
+    def _merge(self, shard: int, snapshot: ProgressSnapshot):
+        """Fold one shard's snapshot into the batch-wide progress"""
+        previous_bytes = self._reported.get(shard, (0, 0, 0, {}))[2]
+        self._reported[shard] = (
+            snapshot.completed, snapshot.failed, snapshot.bytes_downloaded, snapshot.concurrency_limits
+        )
+        self.events.add_bytes(snapshot.bytes_downloaded - previous_bytes)
+        for message, level in snapshot.messages:
+            self.events.message(f"[shard {shard}] {message}", level)
+        if snapshot.dropped_messages:
+            self.events.add_dropped(snapshot.dropped_messages)
+
+        limits: Dict[str, int] = {}
+        for _, _, _, shard_limits in self._reported.values():
+            for host, limit in shard_limits.items():
+                # The shards' limits add up to what the host sees
+                limits[host] = limits.get(host, 0) + limit
+        self.events.concurrency(limits)
+        self.events.progress(
+            sum(reported[0] for reported in self._reported.values()),
+            sum(reported[1] for reported in self._reported.values()),
+            snapshot.current_file or None
+        )
+
+    def _reroute(self, shard: int, entries: List[Tuple[int, DownloadItem]]):
+        """Items a finished shard turned down go to one still running, or fail"""
+        with self._lock:
+            self._stopped(shard)
+            if self._running and not self._cancel:
+                self._route(entries)
+                return
+        for index, _ in entries:
+            item = self.items[index]
+            item.error = "Added after the batch finished"
+            self.failed_items.append(item)
+
+    def _finish_shard(self, shard: int, result: Dict):
+        """Copy a shard's outcomes onto the batch's items"""
+        with self._lock:
+            self._stopped(shard)
+        for index, filename, error in result["items"]:
+            item = self.items[index]
+            item.filename = filename
+            item.error = error
+        self.failed_items.extend(self.items[index] for index in result["failed"])
+        self.completed += result["completed"]
+
+    def _stopped(self, shard: int):
+        """Stop routing added items to a shard that no longer takes them"""
+        if shard in self._running:
+            self._running.remove(shard)
+
+    def _lost(self, shard: int, exitcode: Optional[int]) -> Dict:
+        """Result of a shard that died without reporting; its items count as failed"""
+        with self._lock:
+            self._stopped(shard)
+        self._log(f"Shard {shard} exited unexpectedly with code {exitcode}", "error")
+        failed = [item for item in self.items if shard_of(item, self.shards) == shard]
+        for item in failed:
+            item.error = item.error or f"Shard process exited with code {exitcode}"
+        self.failed_items.extend(failed)
+        return {"success": False}
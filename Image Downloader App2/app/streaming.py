@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from typing import BinaryIO, Iterator, Optional, Union
+import requests
+from .constants import (
+    PREALLOCATE_MIN_SIZE,
+    STREAM_BUFFER_MAX,
+    STREAM_BUFFER_MIN,
+    STREAM_READ_TARGET
+)
+
+_local = threading.local()
+
+def _thread_buffer() -> memoryview:
+    """This thread's read buffer, allocated once at the largest read size"""
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is None:
+        buffer = _local.buffer = memoryview(bytearray(STREAM_BUFFER_MAX))
+    return buffer
+
+def next_read_size(size: int, count: int, elapsed: float) -> int:
+    """
+    Grow or shrink the read size so one read takes about STREAM_READ_TARGET.
+
+    Fast links get big reads and few loop iterations, slow ones small reads
+    so cancelling and progress stay responsive.
+    """
+    if count < size:
+        # Short read: end of body or a slow sender, no information about the link
+        return size
+    if elapsed < STREAM_READ_TARGET / 2:
+        return min(size * 2, STREAM_BUFFER_MAX)
+    if elapsed > STREAM_READ_TARGET * 2:
+        return max(size // 2, STREAM_BUFFER_MIN)
+    return size
+
+def preallocate(f: BinaryIO, size: Optional[int]) -> bool:
+    """
+    Reserve disk space for a new file of `size` bytes before writing it.
+
+    Only large files with a known length are worth it; the space comes in
+    as few extents as the filesystem can manage instead of growing chunk by
+    chunk. Returns False where posix_fallocate isn't available (Windows) or
+    the filesystem refuses it. The caller must truncate the file to what it
+    actually wrote if the body ends early.
+    """
+    if not size or size < PREALLOCATE_MIN_SIZE or not hasattr(os, 'posix_fallocate'):
+        return False
+    try:
+        os.posix_fallocate(f.fileno(), 0, size)
+    except OSError:
+        return False
+    return True
+
+class BodyReader:
+    """
+    Iterates the body of a streamed requests response with few, large reads.
+
+    Bodies without a content-encoding are read with readinto() into a
+    per-thread buffer that is reused across chunks and downloads, in reads
+    sized by next_read_size(). Compressed bodies go through iter_content,
+    which decodes them. Chunks are memoryviews of the shared buffer and are
+    only valid until the next one is requested.
+    """
+
+    def __init__(self, response: requests.Response):
+        encoding = response.headers.get('content-encoding', '').strip().lower()
+        self.raw = response.raw if encoding in ('', 'identity') else None
+        self.response = response
+        self._chunks: Optional[Iterator[bytes]] = None
+
+    def _iter_content(self) -> Iterator[bytes]:
+        if self._chunks is None:
+            self._chunks = self.response.iter_content(chunk_size=STREAM_BUFFER_MIN)
+        return self._chunks
+
+    def read_head(self, size: int) -> bytes:
+        """The first `size` bytes or so, enough to sniff the format; iteration continues after them"""
+        if self.raw is not None:
+            return self.raw.read(size)
+        head = b''
+        for chunk in self._iter_content():
+            head += chunk
+            if len(head) >= size:
+                break
+        return head
+
+    def __iter__(self) -> Iterator[Union[bytes, memoryview]]:
+        if self.raw is None:
+            yield from self._iter_content()
+            return
+
+        buffer = _thread_buffer()
+        size = STREAM_BUFFER_MIN
+        while True:
+            started = time.perf_counter()
+            count = self.raw.readinto(buffer[:size])
+            if not count:
+                return
+            elapsed = time.perf_counter() - started
+            yield buffer[:count]
+            size = next_read_size(size, count, elapsed)
@@ -1,87 +1,193 @@
-import os
-import re
-import mimetypes
-from urllib.parse import urlparse
-from pathlib import Path
-from typing import Optional, Tuple
-import requests
-
-def validate_url(url: str) -> bool:
-    """Validate that URL is properly formatted and uses allowed schemes"""
-    try:
-        result = urlparse(url)
-        return all([result.scheme in ('http', 'https'), result.netloc])
-    except ValueError:
-        return False
-
-def convert_share_link(url: str) -> Optional[str]:
-    """Convert cloud service share links to direct download links"""
-    # Dropbox
-    if 'dropbox.com' in url:
-        if 'dl=0' in url:
-            return url.replace('dl=0', 'dl=1')
-        if '?' in url:
-            return f"{url}&dl=1"
-        return f"{url}?dl=1"
-    
-    # Google Drive
-    if 'drive.google.com' in url:
-        file_id = None
-        if '/file/d/' in url:
-            file_id = url.split('/file/d/')[1].split('/')[0]
-        elif 'id=' in url:
-            file_id = url.split('id=')[1].split('&')[0]
-        
-        if file_id:
-            return f"https://drive.google.com/uc?export=download&id={file_id}"
-    
-    # Return original URL if not a known share link
-    return url if validate_url(url) else None
-
-def sanitize_filename(filename: str) -> str:
-    """Sanitize filename by removing invalid characters"""
-    # Replace invalid characters with underscore
-    filename = re.sub(r'[<>:"/\\|?*\x00-\x1f]', '_', filename)
-    # Remove leading/trailing spaces and dots
-    filename = filename.strip(' .')
-    # Ensure filename is not empty
-    if not filename:
-        filename = "unnamed"
-    return filename
-
-def get_extension_from_url(url: str) -> Optional[str]:
-    """Try to get file extension from URL"""
-    # Try from URL path
-    path = urlparse(url).path
-    ext = Path(path).suffix.lower()
-    if ext:
-        return ext[1:]  # Remove leading dot
-    
-    # Try from content type if available
-    try:
-        response = requests.head(url, timeout=5, allow_redirects=True)
-        content_type = response.headers.get('content-type', '').split(';')[0]
-        return mimetypes.guess_extension(content_type)
-    except:
-        return None
-
-def is_valid_image(content_type: str, first_bytes: bytes) -> bool:
-    """Check if content appears to be a valid image"""
-    # Check content type
-    image_types = ['image/jpeg', 'image/png', 'image/webp', 'image/gif']
-    if content_type.lower() in image_types:
-        return True
-    
-    # Check magic numbers
-    magic_numbers = {
-        b'\xFF\xD8\xFF': 'jpg',
-        b'\x89PNG': 'png',
-        b'RIFF....WEBP': 'webp',
-        b'GIF8': 'gif'
-    }
-    
-    for magic, _ in magic_numbers.items():
-        if first_bytes.startswith(magic):
-            return True
-    
-    return False
\ No newline at end of file
+import csv
+import os
+import re
+from urllib.parse import urlparse, urlsplit, urlunsplit, parse_qsl, urlencode
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+from .constants import IMAGE_MAGIC_NUMBERS, MIME_TO_EXTENSION, PRIORITY_NAMES
+from .models import DownloadItem
+
+def validate_url(url: str) -> bool:
+    """Validate that URL is properly formatted and uses allowed schemes"""
+    try:
+        result = urlparse(url)
+        return all([result.scheme in ('http', 'https'), result.netloc])
+    except ValueError:
+        return False
+
+def convert_share_link(url: str) -> Optional[str]:
+    """Convert cloud service share links to direct download links"""
+    # Dropbox
+    if 'dropbox.com' in url:
+        if 'dl=0' in url:
+            return url.replace('dl=0', 'dl=1')
+        if '?' in url:
+            return f"{url}&dl=1"
+        return f"{url}?dl=1"
+    
+    # Google Drive
+    if 'drive.google.com' in url:
+        file_id = None
+        if '/file/d/' in url:
+            file_id = url.split('/file/d/')[1].split('/')[0]
+        elif 'id=' in url:
+            file_id = url.split('id=')[1].split('&')[0]
+        
+        if file_id:
+            return f"https://drive.google.com/uc?export=download&id={file_id}"
+    
+    # Return original URL if not a known share link
+    return url if validate_url(url) else None
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL for dedup and cache keys"""
+    direct_url = (convert_share_link(url) or url).strip()
+    try:
+        parts = urlsplit(direct_url)
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or '').lower()
+        port = parts.port
+    except ValueError:
+        return direct_url
+
+    # Drop default ports, fragments and query parameter order
+    netloc = host
+    if port and (scheme, port) not in (('http', 80), ('https', 443)):
+        netloc = f"{host}:{port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, parts.path or '/', query, ''))
+
+def get_host(url: str) -> str:
+    """Host a URL is actually requested from, after share-link conversion"""
+    try:
+        return urlparse(convert_share_link(url) or url).hostname or ''
+    except ValueError:
+        return ''
+
+def shard_filename(filename: str, shard: Optional[int]) -> str:
+    """Per-shard variant of a state or report file name, unchanged outside sharded mode"""
+    if shard is None:
+        return filename
+    base, ext = os.path.splitext(filename)
+    return f"{base}.shard-{shard}{ext}"
+
+def sanitize_filename(filename: str) -> str:
+    """Sanitize filename by removing invalid characters"""
+    # Replace invalid characters with underscore
+    filename = re.sub(r'[<>:"/\\|?*\x00-\x1f]', '_', filename)
+    # Remove leading/trailing spaces and dots
+    filename = filename.strip(' .')
+    # Ensure filename is not empty
+    if not filename:
+        filename = "unnamed"
+    return filename
+
+def get_extension_from_url(url: str) -> Optional[str]:
+    """Try to get file extension from URL"""
+    path = urlparse(url).path
+    ext = Path(path).suffix.lower()
+    if ext:
+        return ext[1:]  # Remove leading dot
+    return None
+
+# Magic numbers use '.' for "any byte" (RIFF....WEBP skips the chunk size)
+_MAGIC_PATTERNS = [
+    (re.compile(b'.'.join(re.escape(part) for part in magic.split(b'.')), re.DOTALL), name)
+    for magic, name in IMAGE_MAGIC_NUMBERS.items()
+]
+
+# Bytes needed from the start of a file to recognize every format
+SNIFF_LENGTH = max(len(magic) for magic in IMAGE_MAGIC_NUMBERS)
+
+def sniff_image_type(first_bytes: bytes) -> Optional[str]:
+    """Identify an image format from its leading bytes (JPEG, PNG, WEBP, GIF)"""
+    for pattern, name in _MAGIC_PATTERNS:
+        if pattern.match(first_bytes):
+            return name
+    return None
+
+def get_extension_from_response(content_type: str, first_bytes: bytes) -> Optional[str]:
+    """Image extension from a response's Content-Type, or from its leading bytes"""
+    ext = MIME_TO_EXTENSION.get(content_type.split(';')[0].strip().lower())
+    if ext is None:
+        sniffed = sniff_image_type(first_bytes)
+        ext = MIME_TO_EXTENSION.get(f"image/{sniffed.lower()}") if sniffed else None
+    return ext[1:] if ext else None
+
+def is_valid_image(content_type: str, first_bytes: bytes) -> bool:
+    """Check if content appears to be a valid image"""
+    # Check content type
+    if content_type.split(';')[0].strip().lower() in MIME_TO_EXTENSION:
+        return True
+
+    # Check magic numbers
+    return sniff_image_type(first_bytes) is not None
+
+def _cell_text(value) -> str:
+    """Spreadsheet cell as text, without the '.0' Excel adds to whole numbers"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+def parse_priority(text: str) -> Optional[int]:
+    """A priority given as low/normal/high or a number, None when blank"""
+    text = text.strip().lower()
+    if not text:
+        return None
+    if text in PRIORITY_NAMES:
+        return PRIORITY_NAMES[text]
+    try:
+        return int(text)
+    except ValueError:
+        raise ValueError(f"Invalid priority '{text}', expected one of {', '.join(PRIORITY_NAMES)}")
+
+def read_download_items(
+    path: str,
+    url_column: str = "url",
+    filename_column: str = "filename",
+    priority_column: str = "priority"
+) -> List[DownloadItem]:
+    """Read download rows from a CSV or XLSX file; column names match case-insensitively"""
+    ext = Path(path).suffix.lower()
+    if ext == ".csv":
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            rows = list(csv.reader(f))
+    elif ext == ".xlsx":
+        # openpyxl is only needed for Excel input, import on demand
+        import openpyxl
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = [list(row) for row in workbook.active.iter_rows(values_only=True)]
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f"Unsupported input file type: {ext or path}")
+
+    if not rows:
+        return []
+    header = [_cell_text(cell).lower() for cell in rows[0]]
+    if url_column.lower() not in header:
+        raise ValueError(f"Column '{url_column}' not found in {path}")
+    url_index = header.index(url_column.lower())
+    name_index = header.index(filename_column.lower()) if filename_column.lower() in header else None
+    priority_index = header.index(priority_column.lower()) if priority_column.lower() in header else None
+
+    items = []
+    for row in rows[1:]:
+        url = _cell_text(row[url_index]) if url_index < len(row) else ""
+        if not url:
+            continue
+        filename = _cell_text(row[name_index]) if name_index is not None and name_index < len(row) else ""
+        priority = _cell_text(row[priority_index]) if priority_index is not None and priority_index < len(row) else ""
+        items.append(DownloadItem(url=url, filename=filename or None, priority=parse_priority(priority)))
+    return items
+
+def write_error_report(path: str, items: Iterable[DownloadItem]):
+    """Write failed items as a CSV with URL, Filename and Error columns"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["URL", "Filename", "Error"])
+        for item in items:
+            writer.writerow([item.url, item.filename, item.error])
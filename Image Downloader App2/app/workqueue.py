@@ -0,0 +1,242 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from .constants import LEASE_SECONDS, PRIORITY_NORMAL, QUEUE_LOCK_TIMEOUT
+from .journal import DONE, FAILED, QUEUED, item_key
+from .models import DownloadItem
+from .resume import PART_SUFFIX
+from .scheduler import priority_lane
+
+LEASED = "leased"
+
+class LeaseQueue:
+    """
+    Download items shared by engines on several machines through one SQLite file.
+
+    Any engine can enqueue rows (idempotently, by the journal's item key)
+    and every engine pointed at the file leases items in small batches. A
+    lease belongs to one worker and expires `lease_seconds` after its last
+    heartbeat; a background thread renews this worker's leases every third
+    of that and writes finished items in batches. Items of a worker that
+    died come back once their leases expire and are leased again by the
+    others, so every item is downloaded at least once and normally exactly
+    once.
+
+    The file must live on a filesystem with working POSIX locks (local
+    disk, NFSv4, CIFS with locking), and lease expiry compares wall clocks,
+    so the machines should run NTP. The database uses a rollback journal
+    rather than WAL, which needs shared memory and doesn't work across
+    machines.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        lease_seconds: float = LEASE_SECONDS,
+        worker_id: Optional[str] = None,
+        flush_interval: float = 0.5
+    ):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.flush_interval = flush_interval
+        self.recovered = 0  # Expired leases of other workers taken over
+        # (state, filename, error, updated, key) waiting for the next flush
+        self._finished: List[Tuple[str, Optional[str], Optional[str], float, str]] = []
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Autocommit, transactions are opened explicitly with BEGIN IMMEDIATE
+        self._db = sqlite3.connect(path, timeout=QUEUE_LOCK_TIMEOUT, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=DELETE")
+        with self._transaction() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS items ("
+                " key TEXT PRIMARY KEY, seq INTEGER, url TEXT, filename TEXT, priority INTEGER,"
+                " state TEXT, owner TEXT, expires REAL, leases INTEGER DEFAULT 0, error TEXT, updated REAL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS items_ready ON items (priority, state, seq)")
+            db.execute("CREATE TABLE IF NOT EXISTS names (name TEXT PRIMARY KEY, owner TEXT)")
+
+        self._heartbeat_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
+        self._thread.start()
+
+    @contextmanager
+    def _transaction(self):
+        """A write transaction, taking the database lock up front so leases can't interleave"""
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def enqueue(self, items: List[DownloadItem], default_priority: int = PRIORITY_NORMAL) -> int:
+        """Add the rows of a batch, skipping ones already queued; returns how many were new"""
+        now = time.time()
+        with self._transaction() as db:
+            start = db.execute("SELECT COALESCE(MAX(seq), -1) + 1 FROM items").fetchone()[0]
+            before = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO items (key, seq, url, filename, priority, state, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (item_key(index, item), start + index, item.url, item.filename,
+                     priority_lane(item.priority, default_priority), QUEUED, now)
+                    for index, item in enumerate(items)
+                )
+            )
+            return db.total_changes - before
+
+    def lease(self, limit: int, priority: int) -> List[Tuple[str, DownloadItem]]:
+        """Lease up to `limit` items of a priority lane, queued ones or ones whose lease expired"""
+        now = time.time()
+        with self._transaction() as db:
+            rows = db.execute(
+                "SELECT key, url, filename, state FROM items"
+                " WHERE priority = ? AND (state = ? OR (state = ? AND expires < ?))"
+                " ORDER BY seq LIMIT ?",
+                (priority, QUEUED, LEASED, now, limit)
+            ).fetchall()
+            db.executemany(
+                "UPDATE items SET state = ?, owner = ?, expires = ?, leases = leases + 1, updated = ?"
+                " WHERE key = ?",
+                ((LEASED, self.worker_id, now + self.lease_seconds, now, row[0]) for row in rows)
+            )
+        self.recovered += sum(1 for row in rows if row[3] == LEASED)
+        return [
+            (key, DownloadItem(url=url, filename=filename, priority=priority))
+            for key, url, filename, _ in rows
+        ]
+
+    def outstanding(self, priority: int) -> int:
+        """Items of a lane that this worker may still get: queued, or leased by another worker"""
+        with self._db_lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM items WHERE priority = ? AND (state = ? OR (state = ? AND owner != ?))",
+                (priority, QUEUED, LEASED, self.worker_id)
+            ).fetchone()[0]
+
+    def finish(self, key: str, item: DownloadItem, succeeded: bool):
+        """Record a leased item's outcome, written with the next flush"""
+        with self._lock:
+            self._finished.append(
+                (DONE if succeeded else FAILED, item.filename, None if succeeded else item.error, time.time(), key)
+            )
+
+    def claim_name(self, name: str) -> bool:
+        """Claim an output filename for this worker, False if another worker has it"""
+        with self._transaction() as db:
+            return db.execute(
+                "INSERT OR IGNORE INTO names (name, owner) VALUES (?, ?)",
+                (os.path.normcase(name), self.worker_id)
+            ).rowcount == 1
+
+    def release_name(self, name: str):
+        with self._transaction() as db:
+            db.execute("DELETE FROM names WHERE name = ?", (os.path.normcase(name),))
+
+    def counts(self) -> Dict[str, int]:
+        """Items per state across all workers"""
+        with self._db_lock:
+            return dict(self._db.execute("SELECT state, COUNT(*) FROM items GROUP BY state").fetchall())
+
+    def flush(self):
+        """Write every buffered outcome in a single transaction"""
+        with self._lock:
+            finished, self._finished = self._finished, []
+        if not finished:
+            return
+        try:
+            with self._transaction() as db:
+                db.executemany(
+                    "UPDATE items SET state = ?, filename = ?, error = ?, owner = NULL, expires = NULL, updated = ?"
+                    " WHERE key = ?",
+                    finished
+                )
+        except sqlite3.Error:
+            # Keep them for the next flush, ahead of what finished meanwhile
+            with self._lock:
+                self._finished[:0] = finished
+            raise
+
+    def heartbeat(self):
+        """Extend every lease this worker holds"""
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE items SET expires = ? WHERE owner = ? AND state = ?",
+                (now + self.lease_seconds, self.worker_id, LEASED)
+            )
+        self._heartbeat_at = time.monotonic()
+
+    def release(self):
+        """Put this worker's unfinished leases back in the queue for the others"""
+        self.flush()
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE items SET state = ?, owner = NULL, expires = NULL, updated = ? WHERE owner = ? AND state = ?",
+                (QUEUED, time.time(), self.worker_id, LEASED)
+            )
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                if time.monotonic() - self._heartbeat_at >= self.lease_seconds / 3:
+                    self.heartbeat()
+            except sqlite3.OperationalError:
+                # Another worker held the lock past the timeout, the next round catches up
+                pass
+
+    def close(self):
+        """Stop the heartbeat, write what is left and hand back unfinished leases"""
+        self._stop.set()
+        self._thread.join()
+        self.release()
+        with self._db_lock:
+            self._db.close()
+
+class SharedNames:
+    """
+    NameIndex counterpart for engines on several machines writing to one directory.
+
+    Names are claimed in the queue database, so two workers never pick the
+    same file, and names already used on disk (by an earlier run) are
+    skipped. Costs a small transaction per name tried.
+    """
+
+    def __init__(self, queue: LeaseQueue, directory: str):
+        self.queue = queue
+        self.directory = directory
+        self._counters: Dict[str, int] = {}
+
+    def reserve(self, filename: str) -> str:
+        """Claim a free path for filename, adding a counter on collision"""
+        key = os.path.normcase(filename)
+        base, ext = os.path.splitext(filename)
+        counter = self._counters.get(key, 0)
+        while True:
+            candidate = f"{base}_{counter}{ext}" if counter else filename
+            path = os.path.join(self.directory, candidate)
+            if (not os.path.exists(path) and not os.path.exists(path + PART_SUFFIX)
+                    and self.queue.claim_name(candidate)):
+                break
+            counter += 1
+        # Later copies of the name start looking after this one
+        self._counters[key] = counter + 1
+        return path
+
+    def release(self, filepath: str):
+        """Give back a reserved name whose download failed"""
+        self.queue.release_name(os.path.basename(filepath))
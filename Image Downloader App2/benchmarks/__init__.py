@@ -0,0 +1 @@
+"""Throughput benchmarks for the download engines against a local stand-in server"""
@@ -0,0 +1,174 @@
+"""
+Benchmark entry point: python -m benchmarks [options]
+
+Runs download batches against a local stand-in server for each scenario,
+engine and batch size, prints one line per run and saves everything as
+JSON so later runs can be compared with --compare.
+"""
+import argparse
+import dataclasses
+import json
+import os
+import platform
+import sys
+import time
+from typing import Dict, List, Optional
+from .runner import run_scenario
+from .server import ServerProfile
+
+KB = 1024
+MB = 1024 * 1024
+
+SCENARIOS = {
+    "baseline": ServerProfile(),
+    "latency": ServerProfile(latency=0.05, latency_jitter=0.04),
+    "bandwidth": ServerProfile(bandwidth=2 * MB, size_min=256 * KB, size_max=2 * MB),
+    "errors": ServerProfile(error_rate=0.03, throttle_rate=0.02),
+    "no-length": ServerProfile(no_length_rate=0.5),
+    "redirects": ServerProfile(redirects=3),
+    # Multi-hundred-MB files, where the write path's CPU per GB shows
+    "large": ServerProfile(size_min=64 * MB, size_max=512 * MB, size_distribution="lognormal"),
+    # Slow transfers and long Retry-After backoffs, cancelled mid-batch
+    "cancel": ServerProfile(
+        latency=0.2,
+        bandwidth=256 * KB,
+        size_min=2 * MB,
+        size_max=8 * MB,
+        throttle_rate=0.2,
+        retry_after=30
+    ),
+    "mixed": ServerProfile(
+        latency=0.03,
+        latency_jitter=0.02,
+        size_min=4 * KB,
+        size_max=4 * MB,
+        size_distribution="lognormal",
+        error_rate=0.01,
+        throttle_rate=0.01,
+        no_length_rate=0.2,
+        redirects=1
+    )
+}
+
+# Batch size when --items isn't given, the large scenario would need ~100 GB of disk at 1000
+DEFAULT_ITEMS = {"large": 20, "cancel": 200}
+
+# Seconds into the batch a scenario cancels it; these runs report cancel latency
+CANCEL_AFTER = {"cancel": 3.0}
+# A cancel should end the batch within this, the run is marked failed otherwise
+CANCEL_LATENCY_LIMIT = 1.0
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Measure download engine throughput against a local stand-in server."
+    )
+    parser.add_argument("-s", "--scenario", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("-n", "--items", nargs="+", type=int,
+                        help="Batch sizes to run, e.g. 1000 10000 100000 (default: 1000, large: 20)")
+    parser.add_argument("--engine", nargs="+", choices=["threads", "asyncio"], default=["threads", "asyncio"])
+    parser.add_argument("--workers", type=int, default=16, help="Download threads (threads engine)")
+    parser.add_argument("--concurrency", type=int, default=200, help="In-flight downloads (asyncio engine)")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--max-size", type=int, default=1024, help="Largest file to keep, in MB")
+    parser.add_argument("--adaptive", action="store_true", help="Adaptive per-host concurrency, starting at --workers")
+    parser.add_argument("--no-journal", action="store_true", help="Run without the batch journal")
+    parser.add_argument("--timeout", type=float, default=3600, help="Seconds before a run is abandoned")
+    parser.add_argument("--keep-files", action="store_true", help="Keep the downloaded files of each run")
+    parser.add_argument("-o", "--output", help=f"Results file (default: {RESULTS_DIR}/<timestamp>.json)")
+    parser.add_argument("--compare", metavar="RESULTS", help="Earlier results file to compare against")
+    return parser
+
+def _format_run(run: Dict) -> str:
+    label = f"{run['scenario']:<10} {run['engine']:<8} {run['items']:>7}"
+    if "error" in run:
+        return f"{label}  {run['error']}"
+    p50 = run["item_latency_p50"] or 0
+    p99 = run["item_latency_p99"] or 0
+    rss = run["peak_rss_mb"]
+    return (
+        f"{label}  {run['items_per_second']:>9.1f} items/s {run['mb_per_second']:>8.2f} MB/s  "
+        f"p50 {p50 * 1000:>7.1f}ms p99 {p99 * 1000:>7.1f}ms  "
+        f"cpu {run['cpu_percent']:>5.1f}% ({run['cpu_seconds_per_gb'] or 0:.2f}s/GB)  rss {rss if rss is not None else '-':>6} MB  "
+        f"failed {run['failed']}"
+    ) + _format_cancel(run)
+
+def _format_cancel(run: Dict) -> str:
+    if run.get("cancel_latency") is None:
+        return ""
+    return f"  cancelled in {run['cancel_latency'] * 1000:.0f}ms, {run['partial_files']} partial files left"
+
+def _run_key(run: Dict):
+    return run["scenario"], run["engine"], run["items"]
+
+def compare(previous: Dict, current: Dict) -> List[str]:
+    """One line per run present in both results, with the relative change of the headline numbers"""
+    earlier = {_run_key(run): run for run in previous.get("runs", []) if "error" not in run}
+    lines = []
+    for run in current["runs"]:
+        old = earlier.get(_run_key(run))
+        if old is None or "error" in run:
+            continue
+        changes = []
+        for field, label in (("items_per_second", "items/s"), ("item_latency_p99", "p99"),
+                             ("cpu_seconds_per_gb", "cpu/GB"), ("peak_rss_mb", "rss")):
+            before, after = old.get(field), run.get(field)
+            if before and after is not None:
+                changes.append(f"{label} {(after - before) / before:+.1%}")
+        lines.append(f"{run['scenario']:<10} {run['engine']:<8} {run['items']:>7}  " + ", ".join(changes))
+    return lines
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    options = dict(
+        batch_size=args.workers,
+        concurrency=args.concurrency,
+        max_retries=args.retries,
+        max_file_size=args.max_size,
+        use_journal=not args.no_journal,
+        adaptive_concurrency=args.adaptive
+    )
+    results = {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "options": options,
+        "scenarios": {name: dataclasses.asdict(SCENARIOS[name]) for name in args.scenario},
+        "runs": []
+    }
+
+    for name in args.scenario:
+        for engine in args.engine:
+            for count in args.items or [DEFAULT_ITEMS.get(name, 1000)]:
+                run = {"scenario": name, "engine": engine, "items": count}
+                run.update(run_scenario(
+                    SCENARIOS[name], engine, count, options, args.keep_files, args.timeout, CANCEL_AFTER.get(name)
+                ))
+                if run.get("cancel_latency") is not None and (
+                    run["cancel_latency"] > CANCEL_LATENCY_LIMIT or run["partial_files"]
+                ):
+                    run["error"] = (
+                        f"Cancel took {run['cancel_latency']:.2f}s and left {run['partial_files']} partial files"
+                    )
+                results["runs"].append(run)
+                print(_format_run(run), flush=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        print(f"Compared with {args.compare}:")
+        for line in compare(previous, results):
+            print(line)
+    return 1 if any("error" in run for run in results["runs"]) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
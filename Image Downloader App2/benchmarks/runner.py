@@ -0,0 +1,145 @@
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from .server import ServerProfile, serve
+
+# spawn everywhere so runs measure the same thing on Windows and Linux,
+# and a batch process never inherits the server's or an earlier run's memory
+_context = multiprocessing.get_context("spawn")
+
+def _peak_rss() -> Optional[int]:
+    """Peak resident memory of this process in bytes, None where it can't be read"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _cpu_seconds() -> float:
+    times = os.times()
+    return times.user + times.system
+
+def run_batch(
+    engine: str,
+    base_url: str,
+    count: int,
+    options: Dict,
+    keep_files: bool,
+    results,
+    cancel_after: Optional[float] = None
+):
+    """
+    Batch process entry point: download `count` images and send the measurements back.
+
+    With `cancel_after` the batch is cancelled from another thread that many
+    seconds in, and the time until start() returns is reported as the
+    cancel latency along with any partial files left behind.
+    """
+    from app.downloader import DownloadCore
+    from app.models import DownloadItem
+
+    items = [DownloadItem(url=f"{base_url}/img/{i}.png") for i in range(count)]
+    output_dir = tempfile.mkdtemp(prefix="image-downloader-bench-")
+    kwargs = dict(output_dir=output_dir, host_limits={}, **options)
+    if engine == "asyncio":
+        from app.async_downloader import AsyncDownloadCore
+        core = AsyncDownloadCore(items, **kwargs)
+    else:
+        kwargs.pop("concurrency", None)
+        core = DownloadCore(items, **kwargs)
+
+    cancelled_at = []
+    def cancel():
+        cancelled_at.append(time.perf_counter())
+        core.cancel()
+    timer = threading.Timer(cancel_after, cancel) if cancel_after else None
+
+    cpu = _cpu_seconds()
+    started = time.perf_counter()
+    if timer:
+        timer.start()
+    core.start()
+    finished = time.perf_counter()
+    seconds = finished - started
+    cpu = _cpu_seconds() - cpu
+    if timer:
+        timer.cancel()
+
+    metrics = core.metrics
+    peak_rss = _peak_rss()
+    total_bytes = sum(host.bytes for host in metrics.hosts.values())
+    results.send({
+        "completed": core.completed,
+        "failed": len(core.failed_items),
+        "seconds": round(seconds, 3),
+        "items_per_second": round(count / seconds, 2),
+        "mb_per_second": round(total_bytes / seconds / 1024 / 1024, 3),
+        "bytes": total_bytes,
+        "item_latency_p50": metrics.item_latency.quantile(0.5),
+        "item_latency_p99": metrics.item_latency.quantile(0.99),
+        "retries": sum(host.retries for host in metrics.hosts.values()),
+        "cpu_seconds": round(cpu, 3),
+        "cpu_percent": round(cpu / seconds * 100, 1),
+        "cpu_seconds_per_gb": round(cpu / (total_bytes / 1024 ** 3), 3) if total_bytes else None,
+        "peak_rss_mb": round(peak_rss / 1024 / 1024, 1) if peak_rss else None,
+        "cancel_latency": round(finished - cancelled_at[0], 3) if cancelled_at else None,
+        "partial_files": len(list(Path(output_dir).glob("*.part"))),
+        "output_dir": output_dir if keep_files else None
+    })
+    if not keep_files:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+def run_scenario(
+    profile: ServerProfile,
+    engine: str,
+    count: int,
+    options: Dict,
+    keep_files: bool = False,
+    timeout: float = 3600,
+    cancel_after: Optional[float] = None
+) -> Dict:
+    """
+    Run one batch against a fresh stand-in server.
+
+    Server and engine each get their own process, so the engine's CPU and
+    peak memory are its own and the server never competes for its GIL.
+    """
+    server_conn, server_end = _context.Pipe()
+    stop = _context.Event()
+    server = _context.Process(target=serve, args=(profile, server_end, stop), daemon=True)
+    server.start()
+    try:
+        base_url = server_conn.recv()
+        results, results_end = _context.Pipe(duplex=False)
+        batch = _context.Process(
+            target=run_batch, args=(engine, base_url, count, options, keep_files, results_end, cancel_after)
+        )
+        batch.start()
+        deadline = time.monotonic() + timeout
+        while not results.poll(1):
+            if not batch.is_alive() or time.monotonic() > deadline:
+                break
+        if results.poll(0):
+            result = results.recv()
+        elif batch.is_alive():
+            batch.terminate()
+            result = {"error": f"Timed out after {timeout:.0f}s"}
+        else:
+            result = {"error": f"Batch process exited with code {batch.exitcode}"}
+        batch.join()
+        stop.set()
+        result["server_requests"] = server_conn.recv() if server_conn.poll(10) else None
+    finally:
+        stop.set()
+        server.join(10)
+        if server.is_alive():
+            server.terminate()
+    return result
@@ -0,0 +1,182 @@
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+# A PNG signature is all the engine sniffs, the rest of the body is filler
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+WRITE_CHUNK = 16 * 1024
+
+@dataclass
+class ServerProfile:
+    """How the stand-in server behaves, every rate is a probability per response"""
+    latency: float = 0.0  # Seconds before the response headers
+    latency_jitter: float = 0.0  # +/- seconds, uniform
+    bandwidth: float = 0.0  # Bytes per second per connection, 0 = unthrottled
+    size_min: int = 20 * 1024
+    size_max: int = 200 * 1024
+    size_distribution: str = "uniform"  # fixed, uniform or lognormal
+    error_rate: float = 0.0  # 500 Internal Server Error
+    throttle_rate: float = 0.0  # 429 Too Many Requests with Retry-After
+    retry_after: int = 1
+    no_length_rate: float = 0.0  # Chunked body without content-length
+    redirects: int = 0  # 302 hops before every image
+    seed: int = 0
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    Local image server for benchmarks.
+
+    Serves /img/<name> with the behaviour of a ServerProfile. Outcomes are
+    drawn from a generator seeded by the path and how often it was asked
+    for, so the same profile gives the same errors, sizes and retries on
+    every run regardless of request order.
+    """
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, profile: ServerProfile, address=("127.0.0.1", 0)):
+        super().__init__(address, StandInHandler)
+        self.profile = profile
+        # Random filler repeated up to the largest size, cheap even for GB-sized profiles
+        block = random.Random(profile.seed).randbytes(min(max(profile.size_max, 1), 1024 * 1024))
+        self.body = (PNG_SIGNATURE + block * (profile.size_max // len(block) + 1))[:profile.size_max]
+        self._hits: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def outcome(self, path: str) -> random.Random:
+        """Generator for this request of the path, the nth request gets the nth outcome"""
+        with self._lock:
+            hit = self._hits.get(path, 0)
+            self._hits[path] = hit + 1
+            self.requests += 1
+        return random.Random(zlib.crc32(f"{self.profile.seed}:{path}:{hit}".encode()))
+
+    def size_of(self, path: str) -> int:
+        """Body size for a path, the same on every request so resumes stay valid"""
+        profile = self.profile
+        rng = random.Random(zlib.crc32(f"{profile.seed}:{path}".encode()))
+        if profile.size_distribution == "fixed" or profile.size_max <= profile.size_min:
+            size = profile.size_max
+        elif profile.size_distribution == "lognormal":
+            # Most files near the low end, a long tail of big ones
+            median = (profile.size_min * profile.size_max) ** 0.5
+            size = int(rng.lognormvariate(0, 1) * median)
+        else:
+            size = rng.randint(profile.size_min, profile.size_max)
+        return max(len(PNG_SIGNATURE), min(max(size, profile.size_min), profile.size_max))
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: StandInServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        profile = self.server.profile
+        url = urlparse(self.path)
+        if not url.path.startswith("/img/"):
+            self._empty(404)
+            return
+
+        hop = int(parse_qs(url.query).get("hop", ["0"])[0])
+        if hop < profile.redirects:
+            self.send_response(302)
+            self.send_header("Location", f"{url.path}?hop={hop + 1}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        rng = self.server.outcome(url.path)
+        delay = profile.latency + rng.uniform(-profile.latency_jitter, profile.latency_jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        roll = rng.random()
+        if roll < profile.error_rate:
+            self._empty(500)
+            return
+        if roll < profile.error_rate + profile.throttle_rate:
+            self._empty(429, {"Retry-After": str(profile.retry_after)})
+            return
+
+        size = self.server.size_of(url.path)
+        start = self._range_start(size)
+        body = memoryview(self.server.body)[start:size]
+        chunked = rng.random() < profile.no_length_rate
+
+        self.send_response(206 if start else 200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", f'"{zlib.crc32(url.path.encode()):08x}-{size}"')
+        if start:
+            self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        try:
+            self._write_body(body, chunked)
+        except (BrokenPipeError, ConnectionResetError):
+            # The engine dropped the transfer (cancel, size limit), not a server fault
+            self.close_connection = True
+
+    def _range_start(self, size: int) -> int:
+        value = self.headers.get("Range", "")
+        if not value.startswith("bytes=") or not value.endswith("-"):
+            return 0
+        try:
+            start = int(value[len("bytes="):-1])
+        except ValueError:
+            return 0
+        return start if 0 < start < size else 0
+
+    def _write_body(self, body: memoryview, chunked: bool):
+        bandwidth = self.server.profile.bandwidth
+        started = time.monotonic()
+        sent = 0
+        while sent < len(body):
+            chunk = body[sent:sent + WRITE_CHUNK]
+            if chunked:
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + bytes(chunk) + b"\r\n")
+            else:
+                self.wfile.write(chunk)
+            sent += len(chunk)
+            if bandwidth:
+                # Pace the connection to the profile's bytes per second
+                ahead = sent / bandwidth - (time.monotonic() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+        if chunked:
+            self.wfile.write(b"0\r\n\r\n")
+
+    def _empty(self, status: int, headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+def serve(profile: ServerProfile, ready, stop):
+    """Process entry point: run a server, send its URL through `ready`, stop when `stop` is set"""
+    server = StandInServer(profile)
+    thread = threading.Thread(target=server.serve_forever, name="stand-in-server", daemon=True)
+    thread.start()
+    ready.send(server.base_url)
+    stop.wait()
+    ready.send(server.requests)
+    server.shutdown()
+    server.server_close()
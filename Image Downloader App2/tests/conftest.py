@@ -0,0 +1,71 @@
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(1024)
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    """Answers each path with the next (status, content type, body[, headers]) in the server's script"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        status, content_type, body, *headers = self.server.next_response(self.path)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        for name, value in (headers[0] if headers else {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        seconds = self.server.trickle.get(self.path)
+        try:
+            if not seconds:
+                self.wfile.write(body)
+                return
+            # Spread the body over `seconds`, like a slow link
+            step = max(1, len(body) // 50)
+            for start in range(0, len(body), step):
+                self.wfile.write(body[start:start + step])
+                self.wfile.flush()
+                time.sleep(seconds / 50)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on the transfer
+            self.close_connection = True
+
+class ScriptedServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), ScriptedHandler)
+        self.scripts = {}
+        self.trickle = {}  # Path -> seconds its body takes to send
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+    def next_response(self, path: str):
+        """Pops the path's scripted responses, the last one repeats; unscripted paths get a PNG"""
+        with self._lock:
+            self.requests.append(path)
+            script = self.scripts.get(path)
+            if not script:
+                return 200, "image/png", PNG
+            return script.pop(0) if len(script) > 1 else script[0]
+
+@pytest.fixture
+def server():
+    server = ScriptedServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,42 @@
+import threading
+import pytest
+from app.async_downloader import AsyncDownloadCore
+from app.downloader import DownloadCore
+from app.models import DownloadItem
+from app.retry import CircuitBreaker, HostBreakers
+
+def test_probe_released_without_request():
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure(0)
+    breaker.on_dispatch()
+    assert breaker.wait_time(1) is None
+    breaker.release_probe()
+    assert breaker.wait_time(1) == 0
+
+@pytest.mark.parametrize("engine", [DownloadCore, AsyncDownloadCore])
+def test_probe_ending_in_non_image_closes_circuit(server, tmp_path, engine):
+    # Two 503s open the circuit, the probe gets a 200 that isn't an image
+    server.scripts["/down-1.png"] = [(503, "text/plain", b"")]
+    server.scripts["/down-2.png"] = [(503, "text/plain", b"")]
+    server.scripts["/page.png"] = [(200, "text/html", b"<html></html>")]
+    paths = ["/down-1.png", "/down-2.png", "/page.png", "/a.png", "/b.png"]
+    options = {"concurrency": 1} if engine is AsyncDownloadCore else {}
+    core = engine(
+        [DownloadItem(url=server.url(path)) for path in paths],
+        str(tmp_path),
+        batch_size=1,
+        max_retries=0,
+        host_limits={},
+        use_journal=False,
+        **options
+    )
+    core.breakers = HostBreakers(threshold=2, cooldown=0.1)
+
+    thread = threading.Thread(target=core.start, daemon=True)
+    thread.start()
+    thread.join(15)
+    if thread.is_alive():
+        core.cancel()
+        pytest.fail("Batch still waiting on the host after its probe finished")
+    assert core.completed == 2
+    assert (tmp_path / "a.png").exists() and (tmp_path / "b.png").exists()
@@ -0,0 +1,40 @@
+import threading
+import time
+import pytest
+from app.async_downloader import AsyncDownloadCore
+from app.constants import CANCEL_GRACE
+from app.downloader import DownloadCore
+from app.models import DownloadItem
+from conftest import PNG
+
+@pytest.mark.parametrize("engine", [DownloadCore, AsyncDownloadCore])
+def test_cancel_is_bounded_and_leaves_no_partial_files(server, tmp_path, engine):
+    paths = [f"/slow-{i}.png" for i in range(20)]
+    for path in paths:
+        server.scripts[path] = [(200, "image/png", PNG * 64)]
+        server.trickle[path] = 30
+    finished = threading.Event()
+    options = {"concurrency": 4} if engine is AsyncDownloadCore else {}
+    core = engine(
+        [DownloadItem(url=server.url(path)) for path in paths],
+        str(tmp_path),
+        batch_size=4,
+        host_limits={},
+        on_finished=lambda success: finished.set(),
+        **options
+    )
+    thread = threading.Thread(target=core.start, daemon=True)
+    thread.start()
+
+    deadline = time.monotonic() + 10
+    while not list(tmp_path.glob("*.part")) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert list(tmp_path.glob("*.part")), "No download started streaming"
+
+    cancelled = time.monotonic()
+    core.cancel()
+    assert finished.wait(CANCEL_GRACE + 0.5), "Batch still running after the cancel"
+    assert time.monotonic() - cancelled < 1.0
+    thread.join(5)
+    assert list(tmp_path.glob("*.part")) == []
+    assert core.completed == 0
@@ -0,0 +1,32 @@
+from app.downloader import DownloadCore
+from app.models import DownloadItem
+from conftest import PNG
+
+def _outputs(directory):
+    return sorted(path.name for path in directory.iterdir() if path.suffix == ".png")
+
+def test_rerun_reuses_copies_of_cached_leader(server, tmp_path):
+    server.scripts["/shared.png"] = [
+        (200, "image/png", PNG, {"ETag": '"v1"'}),
+        (304, "image/png", b"", {"ETag": '"v1"'})
+    ]
+    out = tmp_path / "out"
+
+    def run():
+        rows = ["orig.png", "copy.png", "copy.png"]
+        core = DownloadCore(
+            [DownloadItem(url=server.url("/shared.png"), filename=name) for name in rows],
+            str(out),
+            host_limits={},
+            dedup=True,
+            cache_path=str(tmp_path / "cache.sqlite")
+        )
+        core.start()
+        assert core.completed == 3
+        return _outputs(out)
+
+    first = run()
+    assert first == ["copy.png", "copy_1.png", "orig.png"]
+    assert run() == first
+    assert run() == first
+    assert server.requests == ["/shared.png"] * 3
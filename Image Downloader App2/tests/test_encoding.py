@@ -0,0 +1,21 @@
+import gzip
+import pytest
+from app.async_downloader import AsyncDownloadCore
+from app.downloader import DownloadCore
+from app.models import DownloadItem
+from conftest import PNG
+
+@pytest.mark.parametrize("engine", [DownloadCore, AsyncDownloadCore])
+def test_gzip_body_saved_decoded(server, tmp_path, engine):
+    server.scripts["/packed.png"] = [(200, "image/png", gzip.compress(PNG), {"Content-Encoding": "gzip"})]
+    core = engine(
+        [DownloadItem(url=server.url("/packed.png"))],
+        str(tmp_path),
+        max_retries=0,
+        host_limits={},
+        use_journal=False
+    )
+    core.start()
+
+    assert core.completed == 1, [item.error for item in core.failed_items]
+    assert (tmp_path / "packed.png").read_bytes() == PNG
@@ -0,0 +1,38 @@
+import time
+import pytest
+from app.async_downloader import AsyncDownloadCore
+from app.downloader import DownloadCore
+from app.models import DownloadItem
+
+@pytest.mark.parametrize("engine", [DownloadCore, AsyncDownloadCore])
+def test_dead_urls_skip_the_rate_limit(server, tmp_path, engine):
+    paths = [f"/gone-{i}.png" for i in range(20)]
+    for path in paths:
+        server.scripts[path] = [(404, "text/plain", b"")]
+    cache = str(tmp_path / "negative.sqlite")
+
+    def run(host_limits, bypass=False):
+        core = engine(
+            [DownloadItem(url=server.url(path)) for path in paths],
+            str(tmp_path / "out"),
+            host_limits=host_limits,
+            use_journal=False,
+            negative_cache_path=cache,
+            bypass_negative_cache=bypass
+        )
+        core.start()
+        return core
+
+    first = run({})
+    assert len(first.failed_items) == 20 and len(server.requests) == 20
+
+    # One request a second would take 20s if the dead URLs were dispatched
+    slow = {"127.0.0.1": {"max_concurrency": 1, "rate": 1.0, "burst": 1}}
+    started = time.monotonic()
+    second = run(slow)
+    assert time.monotonic() - started < 2
+    assert len(second.failed_items) == 20 and len(server.requests) == 20
+    assert all("earlier run" in item.error for item in second.failed_items)
+
+    bypassed = run({}, bypass=True)
+    assert len(bypassed.failed_items) == 20 and len(server.requests) == 40
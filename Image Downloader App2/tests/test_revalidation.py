@@ -0,0 +1,27 @@
+import io
+from PIL import Image
+from app.downloader import DownloadCore
+from app.models import DownloadItem
+
+def test_not_modified_reuses_converted_file(server, tmp_path):
+    image = io.BytesIO()
+    Image.new("RGB", (8, 8), "red").save(image, "PNG")
+    server.scripts["/photo"] = [
+        (200, "image/png", image.getvalue(), {"ETag": '"v1"'}),
+        (304, "image/png", b"", {"ETag": '"v1"'})
+    ]
+    out = tmp_path / "out"
+
+    for _ in range(2):
+        core = DownloadCore(
+            [DownloadItem(url=server.url("/photo"), filename="named.png")],
+            str(out),
+            host_limits={},
+            convert_to="jpeg",
+            cache_path=str(tmp_path / "cache.sqlite")
+        )
+        core.start()
+        assert core.completed == 1
+
+    assert sorted(path.name for path in out.iterdir() if path.suffix in (".png", ".jpg")) == ["named.jpg"]
+    assert core.cache.hits == 1
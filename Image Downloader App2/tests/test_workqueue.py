@@ -0,0 +1,101 @@
+import sqlite3
+import threading
+import time
+import pytest
+from app.downloader import DownloadCore
+from app.journal import DONE
+from app.models import DownloadItem
+from app.workqueue import LeaseQueue
+
+def _items(count: int):
+    return [DownloadItem(url=f"http://example.com/{i}.png") for i in range(count)]
+
+def _stop_heartbeat(queue: LeaseQueue):
+    """Stop a worker the way a crash does, without handing back its leases"""
+    queue._stop.set()
+    queue._thread.join()
+
+def test_workers_lease_disjoint_items(tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+    first, second = LeaseQueue(path), LeaseQueue(path)
+    try:
+        assert first.enqueue(_items(50)) == 50
+        assert second.enqueue(_items(50)) == 0  # Same rows, already queued
+
+        leased = {first.worker_id: [], second.worker_id: []}
+        while True:
+            batches = [(queue, queue.lease(7, 1)) for queue in (first, second)]
+            if not any(batch for _, batch in batches):
+                break
+            for queue, batch in batches:
+                leased[queue.worker_id].extend(key for key, _ in batch)
+
+        keys = leased[first.worker_id] + leased[second.worker_id]
+        assert len(keys) == len(set(keys)) == 50
+        assert leased[first.worker_id] and leased[second.worker_id]
+    finally:
+        first.close()
+        second.close()
+
+def test_expired_lease_taken_over(tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+    dead = LeaseQueue(path, lease_seconds=0.3)
+    dead.enqueue(_items(10))
+    held = dead.lease(10, 1)
+    _stop_heartbeat(dead)
+
+    survivor = LeaseQueue(path, lease_seconds=0.3)
+    try:
+        assert survivor.lease(10, 1) == []
+        assert survivor.outstanding(1) == 10
+        time.sleep(0.5)
+        taken = survivor.lease(10, 1)
+        assert sorted(key for key, _ in taken) == sorted(key for key, _ in held)
+        assert survivor.recovered == 10
+    finally:
+        survivor.close()
+        dead._db.close()
+
+def test_failed_flush_keeps_outcomes(tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+    queue = LeaseQueue(path)
+    _stop_heartbeat(queue)
+    queue.enqueue(_items(3))
+    leased = queue.lease(3, 1)
+    for key, item in leased:
+        queue.finish(key, item, True)
+
+    # Another worker holds the write lock past the timeout
+    queue._db.execute("PRAGMA busy_timeout = 50")
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    with pytest.raises(sqlite3.OperationalError):
+        queue.flush()
+    blocker.execute("ROLLBACK")
+    blocker.close()
+
+    queue.release()
+    assert queue.counts() == {DONE: 3}
+    queue._db.close()
+
+def test_two_engines_share_a_queue(server, tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+    paths = [f"/{i}.png" for i in range(40)]
+    queue = LeaseQueue(path)
+    queue.enqueue([DownloadItem(url=server.url(p)) for p in paths])
+    queue.close()
+    cores = [
+        DownloadCore([], str(tmp_path / "out"), batch_size=2, host_limits={}, queue_path=path)
+        for _ in range(2)
+    ]
+    threads = [threading.Thread(target=core.start, daemon=True) for core in cores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert sum(core.completed for core in cores) == 40
+    assert all(core.completed for core in cores)
+    assert sorted(server.requests) == sorted(paths)  # No item downloaded twice
+    assert len(list((tmp_path / "out").glob("*.png"))) == 40